@@ -1,13 +1,22 @@
 from flask import Blueprint, request, jsonify
-from models.user import User, db
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token  # <-- Add this import
+from models.user import User, db, password_hash_method
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity  # <-- Add this import
 from models.profile import Profile  # <-- Add this import
+from sqlalchemy.exc import IntegrityError
 import datetime
+import logging
 from flask import current_app
+from services.password_hasher import password_hasher, HashingBusy
+
+logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
+def hashing_busy():
+    response = jsonify({'message': 'Server is busy, please retry shortly'})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
 @auth_bp.route('/api/signup', methods=['POST', 'OPTIONS'])
 def signup():
     if request.method == 'OPTIONS':
@@ -18,16 +27,22 @@ def signup():
     password = data.get('password')
     if not username or not email or not password:
         return jsonify({'message': 'Missing required fields'}), 400
-    if User.query.filter((User.username == username) | (User.email == email)).first():
-        return jsonify({'message': 'Username or email already exists'}), 400
     user = User(username=username, email=email)
-    user.set_password(password)
-    db.session.add(user)
-    db.session.commit()
-    # Create a profile for the new user
-    profile = Profile(user_id=user.id, bio='', location='')
-    db.session.add(profile)
-    db.session.commit()
+    try:
+        user.password_hash = password_hasher.hash(password, password_hash_method())
+    except HashingBusy:
+        return hashing_busy()
+    
+    # User and profile in one transaction: the flush assigns user.id, and
+    # the unique username/email keys replace a separate existence check
+    try:
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Profile(user_id=user.id, bio='', location=''))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Username or email already exists'}), 400
     return jsonify({'message': 'User created successfully'}), 201
 
 @auth_bp.route('/api/login', methods=['POST', 'OPTIONS'])
@@ -35,15 +50,45 @@ def login():
     if request.method == 'OPTIONS':
         return '', 200
     data = request.get_json()
-    username_or_email = data.get('username')
-    password = data.get('password')
-    print(f"[DEBUG] Login attempt: username_or_email={username_or_email}")
-    user = User.query.filter((User.username == username_or_email) | (User.email == username_or_email)).first()
-    print(f"[DEBUG] User found: {user is not None}")
-    if user:
-        print(f"[DEBUG] Password check: {user.check_password(password)}")
-    if not user or not user.check_password(password):
-        print("[DEBUG] Invalid credentials")
+    username_or_email = data.get('username') or ''
+    password = data.get('password') or ''
+    
+    # Look up the unique column the input most likely names ('@' suggests an
+    # email); usernames may contain '@' too, so fall back to the other one
+    lookup, fallback = ('email', 'username') if '@' in username_or_email else ('username', 'email')
+    user = User.query.filter(getattr(User, lookup) == username_or_email).first()
+    if user is None:
+        lookup = fallback
+        user = User.query.filter(getattr(User, lookup) == username_or_email).first()
+    
+    # Verify the hash exactly once, off the request worker
+    try:
+        valid = bool(user) and password_hasher.verify(user.password_hash, password)
+    except HashingBusy:
+        return hashing_busy()
+    if not valid:
+        logger.info('Login failed: lookup=%s user_found=%s', lookup, user is not None)
         return jsonify({'message': 'Invalid credentials'}), 401
+    
+    # Upgrade hashes made with old parameters while the plain password is at hand
+    if user.needs_rehash():
+        try:
+            user.password_hash = password_hasher.hash(password, password_hash_method())
+        except HashingBusy:
+            # The login itself succeeded; upgrade on a later one
+            pass
+        else:
+            db.session.commit()
+            logger.info('Rehashed password: user_id=%s method=%s', user.id, password_hash_method())
+    
+    logger.debug('Login succeeded: user_id=%s lookup=%s', user.id, lookup)
     access_token = create_access_token(identity=str(user.id))  # <-- Use string for identity
-    return jsonify({'token': access_token, 'user': user.to_dict()}), 200
\ No newline at end of file
+    return jsonify({'token': access_token, 'user': user.to_dict()}), 200
+
+@auth_bp.route('/api/auth/hashing-metrics', methods=['GET'])
+@jwt_required()
+def hashing_metrics():
+    """Queue depth and latency of the password hashing pool in this worker (admins only)"""
+    if get_jwt_identity() not in current_app.config.get('ADMIN_USER_IDS', ()):
+        return jsonify({'message': 'Admin access required'}), 403
+    return jsonify(password_hasher.metrics()), 200
@@ -1,61 +1,79 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.post import Post
-from models.user import User
-from models.profile import Profile
-from models import db
+from models.post import Post, PostLike
 from sqlalchemy import desc
-import json
+from services.pagination import keyset_paginate
+from services.http_cache import compute_etag, not_modified, with_etag, register_cache_control
 
 feed_bp = Blueprint('feed', __name__)
+register_cache_control(feed_bp)
+
+def page_etag(items, liked_ids, pagination):
+    """ETag for a feed page from the row stamps of its posts and authors.
+
+    Every post UPDATE (edits, likes) bumps post.version and profile edits
+    bump profile.version; the viewer's liked ids cover the 'liked' flags.
+    """
+    stamps = []
+    for post in items:
+        profile = post.user.profile if post.user else None
+        stamps.append((post.id, post.version, profile.version if profile else None))
+    return compute_etag(get_jwt_identity(), pagination, stamps, sorted(liked_ids))
+
+def paginate_feed(query):
+    """Paginate a feed query and serialize it into the feed response"""
+    # Get query parameters for pagination
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    
+    # Cursor mode: ?cursor= (empty for the first page) switches to keyset
+    # pagination, which skips the OFFSET scan and the COUNT(*) query
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        try:
+            items, next_cursor = keyset_paginate(query, Post.created_at, Post.id, per_page, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        }
+    else:
+        posts = query.order_by(desc(Post.created_at)).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        items = posts.items
+        pagination = {
+            'page': page,
+            'per_page': per_page,
+            'total': posts.total,
+            'pages': posts.pages,
+            'has_next': posts.has_next,
+            'has_prev': posts.has_prev
+        }
+    
+    # One lookup for the whole page instead of one per post
+    liked_ids = PostLike.liked_post_ids(get_jwt_identity(), [post.id for post in items])
+    
+    # Unchanged page: skip serialization and send 304
+    etag = page_etag(items, liked_ids, pagination)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    return with_etag(jsonify({
+        'posts': [post.to_feed_dict(liked=post.id in liked_ids) for post in items],
+        'pagination': pagination
+    }), etag)
 
 @feed_bp.route('/api/feed', methods=['GET'])
 @jwt_required()
 def get_feed():
     """Get the main feed with posts from all users"""
     try:
-        # Get query parameters for pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
-        # Query posts with user and profile information
-        posts = Post.query.join(User).join(Profile).order_by(desc(Post.created_at)).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        feed_posts = []
-        for post in posts.items:
-            feed_posts.append({
-                'id': post.id,
-                'title': post.title,
-                'content': post.content,
-                'media_url': post.media_url,
-                'category': post.category,
-                'visibility': post.visibility,
-                'tags': post.tags.split(',') if post.tags else [],
-                'likes_count': post.likes_count,
-                'comments_count': post.comments_count,
-                'created_at': post.created_at.isoformat() if post.created_at else None,
-                'updated_at': post.updated_at.isoformat() if post.updated_at else None,
-                'author': {
-                    'id': post.user.id,
-                    'name': post.user.username,
-                    'avatar_url': post.user.profile.avatar_url if post.user.profile else None,
-                    'title': post.user.profile.title if post.user.profile else None
-                }
-            })
-        
-        return jsonify({
-            'posts': feed_posts,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': posts.total,
-                'pages': posts.pages,
-                'has_next': posts.has_next,
-                'has_prev': posts.has_prev
-            }
-        })
+        # Query posts with user and profile information in one SELECT
+        return paginate_feed(Post.query_with_author())
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -65,48 +83,8 @@ def get_feed():
 def get_feed_by_user(user_id):
     """Get posts from a specific user"""
     try:
-        # Get query parameters for pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
         # Query posts from specific user
-        posts = Post.query.filter_by(user_id=user_id).join(User).join(Profile).order_by(desc(Post.created_at)).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
-        feed_posts = []
-        for post in posts.items:
-            feed_posts.append({
-                'id': post.id,
-                'title': post.title,
-                'content': post.content,
-                'media_url': post.media_url,
-                'category': post.category,
-                'visibility': post.visibility,
-                'tags': post.tags.split(',') if post.tags else [],
-                'likes_count': post.likes_count,
-                'comments_count': post.comments_count,
-                'created_at': post.created_at.isoformat() if post.created_at else None,
-                'updated_at': post.updated_at.isoformat() if post.updated_at else None,
-                'author': {
-                    'id': post.user.id,
-                    'name': post.user.username,
-                    'avatar_url': post.user.profile.avatar_url if post.user.profile else None,
-                    'title': post.user.profile.title if post.user.profile else None
-                }
-            })
-        
-        return jsonify({
-            'posts': feed_posts,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': posts.total,
-                'pages': posts.pages,
-                'has_next': posts.has_next,
-                'has_prev': posts.has_prev
-            }
-        })
+        return paginate_feed(Post.query_with_author().filter(Post.user_id == user_id))
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -1,61 +1,126 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.job import Job, JobApplication
+from models.job import Job, JobApplication, normalize_location
 from models.user import User
-from models.profile import Profile
 from models import db
-from sqlalchemy import desc
+from sqlalchemy import desc, func, event, inspect
+from sqlalchemy.orm import object_session, contains_eager, joinedload
+from sqlalchemy.exc import IntegrityError
+from services.cache import cache
+from services.http_cache import compute_etag, not_modified, with_etag, etag_cached, register_cache_control
 from datetime import datetime
 
 jobs_bp = Blueprint('jobs', __name__)
+register_cache_control(jobs_bp)
+
+def job_version(job_id):
+    """Cheap stamp for GET /api/jobs/<id>: the job's row version and poster name"""
+    row = db.session.query(Job.version, User.username).outerjoin(Job.poster).filter(Job.id == job_id).first()
+    return None if row is None else (job_id, *row)
+
+@cache.cached('jobs:categories', ttl=600, invalidate_on=['job.category'])
+def get_cached_job_categories():
+    """Get categories of active jobs with caching"""
+    categories = db.session.query(Job.category).filter(Job.status == 'active').distinct().order_by(Job.category).all()
+    return [cat[0] for cat in categories if cat[0]]
+
+@jobs_bp.route('/api/jobs/categories', methods=['GET'])
+@jwt_required()
+def get_job_categories():
+    """Get all categories that have active jobs"""
+    try:
+        return jsonify({'categories': get_cached_job_categories()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def parse_list_param(raw):
+    """Split a comma-separated query parameter into a list of values"""
+    return [value.strip() for value in (raw or '').split(',') if value.strip()]
+
+FACETS = ('category', 'employment_type', 'experience_level')
+
+def job_facets(filters, selected):
+    """Counts per category, employment type and experience level.
+
+    Each facet counts the jobs matching the other facets' selections but not
+    its own, so a multi-select sidebar keeps showing the values it can add.
+    One GROUP BY over the three columns with only the non-facet filters;
+    the per-facet totals are summed from its rows.
+    """
+    rows = db.session.query(
+        Job.category, Job.employment_type, Job.experience_level, func.count(Job.id)
+    ).filter(*filters).group_by(
+        Job.category, Job.employment_type, Job.experience_level
+    ).all()
+    
+    facets = {name: {} for name in FACETS}
+    for *values, count in rows:
+        row = dict(zip(FACETS, values))
+        for name in FACETS:
+            if not row[name]:
+                continue
+            if all(not selected[other] or row[other] in selected[other]
+                   for other in FACETS if other != name):
+                facets[name][row[name]] = facets[name].get(row[name], 0) + count
+    return facets
 
 @jobs_bp.route('/api/jobs', methods=['GET'])
 @jwt_required()
 def get_jobs():
-    """Get all available jobs"""
+    """Get active jobs with filters, pagination and facet counts"""
     try:
         # Get query parameters for filtering
         category = request.args.get('category')
         location = request.args.get('location')
+        salary_min = request.args.get('salary_min', type=int)
+        salary_max = request.args.get('salary_max', type=int)
+        employment_types = parse_list_param(request.args.get('employment_type'))
+        experience_levels = parse_list_param(request.args.get('experience_level'))
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
-        # Build query
-        query = Job.query.filter_by(status='active')
-        
-        if category:
-            query = query.filter(Job.category == category)
+        # Build filters; status leads every job index
+        filters = [Job.status == 'active']
         if location:
-            query = query.filter(Job.location.contains(location))
+            # Prefix match on the normalized key can use an index, unlike %location%
+            filters.append(Job.location_key.startswith(normalize_location(location), autoescape=True))
+        if salary_min is not None:
+            # Salary ranges overlap the requested one
+            filters.append(func.coalesce(Job.salary_max, Job.salary_min) >= salary_min)
+        if salary_max is not None:
+            filters.append(func.coalesce(Job.salary_min, Job.salary_max) <= salary_max)
+        
+        # Facet selections filter the jobs, but each facet's counts leave
+        # out its own selection
+        selected = {
+            'category': [category] if category else [],
+            'employment_type': employment_types,
+            'experience_level': experience_levels
+        }
+        facet_filters = [getattr(Job, name).in_(values) for name, values in selected.items() if values]
         
         # Get paginated results
-        jobs = query.order_by(desc(Job.created_at)).paginate(
+        jobs = Job.query_with_poster().filter(*filters, *facet_filters).order_by(desc(Job.created_at)).paginate(
             page=page, per_page=per_page, error_out=False
         )
+        facets = job_facets(filters, selected)
+        applied_ids = JobApplication.applied_job_ids(get_jwt_identity(), [job.id for job in jobs.items])
         
-        job_list = []
-        for job in jobs.items:
-            job_list.append({
-                'id': job.id,
-                'title': job.title,
-                'company': job.company,
-                'location': job.location,
-                'category': job.category,
-                'description': job.description,
-                'requirements': job.requirements,
-                'salary_min': job.salary_min,
-                'salary_max': job.salary_max,
-                'employment_type': job.employment_type,
-                'experience_level': job.experience_level,
-                'created_at': job.created_at.isoformat() if job.created_at else None,
-                'posted_by': {
-                    'id': job.posted_by,
-                    'name': User.query.get(job.posted_by).username if User.query.get(job.posted_by) else 'Unknown'
-                }
-            })
+        # The page's ids, row versions and poster names plus the facets and
+        # applied ids identify the response; answer 304 before serializing
+        # when the client has it
+        etag = compute_etag(jobs.total, facets, sorted(applied_ids), [
+            (job.id, job.version, job.poster.username if job.poster else None) for job in jobs.items
+        ])
+        cached = not_modified(etag)
+        if cached:
+            return cached
         
-        return jsonify({
+        job_list = [dict(job.to_dict(), has_applied=job.id in applied_ids) for job in jobs.items]
+        
+        return with_etag(jsonify({
             'jobs': job_list,
+            'facets': facets,
             'pagination': {
                 'page': page,
                 'per_page': per_page,
@@ -64,41 +129,23 @@ def get_jobs():
                 'has_next': jobs.has_next,
                 'has_prev': jobs.has_prev
             }
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @jobs_bp.route('/api/jobs/<int:job_id>', methods=['GET'])
 @jwt_required()
+@etag_cached(job_version)
 def get_job(job_id):
     """Get a specific job by ID"""
     try:
-        job = Job.query.get(job_id)
+        job = Job.query_with_poster().filter(Job.id == job_id).first()
         
         if not job:
             return jsonify({'error': 'Job not found'}), 404
         
-        job_data = {
-            'id': job.id,
-            'title': job.title,
-            'company': job.company,
-            'location': job.location,
-            'category': job.category,
-            'description': job.description,
-            'requirements': job.requirements,
-            'salary_min': job.salary_min,
-            'salary_max': job.salary_max,
-            'employment_type': job.employment_type,
-            'experience_level': job.experience_level,
-            'created_at': job.created_at.isoformat() if job.created_at else None,
-            'posted_by': {
-                'id': job.posted_by,
-                'name': User.query.get(job.posted_by).username if User.query.get(job.posted_by) else 'Unknown'
-            }
-        }
-        
-        return jsonify(job_data)
+        return jsonify(job.to_dict())
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -119,16 +166,8 @@ def apply_for_job(job_id):
         if job.status != 'active':
             return jsonify({'error': 'Job is not available for applications'}), 400
         
-        # Check if user already applied
-        existing_application = JobApplication.query.filter_by(
-            job_id=job_id, 
-            applicant_id=user_id
-        ).first()
-        
-        if existing_application:
-            return jsonify({'error': 'You have already applied for this job'}), 400
-        
-        # Create application
+        # Create application; the unique (job_id, applicant_id) key rejects
+        # a second one, even from concurrent requests
         application = JobApplication(
             job_id=job_id,
             applicant_id=user_id,
@@ -136,8 +175,12 @@ def apply_for_job(job_id):
             applied_at=datetime.utcnow()
         )
         
-        db.session.add(application)
-        db.session.commit()
+        try:
+            db.session.add(application)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'You have already applied for this job'}), 400
         
         return jsonify({
             'message': 'Application submitted successfully',
@@ -146,4 +189,108 @@ def apply_for_job(job_id):
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/api/jobs/applied', methods=['GET'])
+@jwt_required()
+def get_applied_jobs():
+    """Return which of the given job ids (?ids=1,2,3) the current user has applied to"""
+    user_id = get_jwt_identity()
+    ids = request.args.get('ids', '').strip()
+    try:
+        job_ids = [int(i) for i in ids.split(',') if i.strip()][:100]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of job ids'}), 400
+    
+    applied_ids = JobApplication.applied_job_ids(user_id, job_ids)
+    return jsonify({'applied': [job_id for job_id in job_ids if job_id in applied_ids]})
+
+def applications_page(query):
+    """Paginate an applications query, newest first"""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    applications = query.order_by(desc(JobApplication.applied_at)).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    pagination = {
+        'page': page,
+        'per_page': per_page,
+        'total': applications.total,
+        'pages': applications.pages,
+        'has_next': applications.has_next,
+        'has_prev': applications.has_prev
+    }
+    return applications.items, pagination
+
+@jobs_bp.route('/api/jobs/applications', methods=['GET'])
+@jwt_required()
+def get_my_applications():
+    """Get the current user's applications together with their jobs"""
+    try:
+        user_id = get_jwt_identity()
+        
+        # Served from (applicant_id, applied_at); job and poster come in the same SELECT
+        applications, pagination = applications_page(
+            JobApplication.query.filter(JobApplication.applicant_id == user_id)
+            .join(JobApplication.job)
+            .options(contains_eager(JobApplication.job).joinedload(Job.poster))
+        )
+        
+        return jsonify({
+            'applications': [
+                dict(application.to_dict(), job=application.job.to_dict())
+                for application in applications
+            ],
+            'pagination': pagination
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/api/jobs/<int:job_id>/applications', methods=['GET'])
+@jwt_required()
+def get_job_applications(job_id):
+    """Get the applicants for a job posted by the current user"""
+    try:
+        user_id = get_jwt_identity()
+        
+        job = db.session.query(Job.posted_by).filter(Job.id == job_id).first()
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        if job.posted_by != int(user_id):
+            return jsonify({'error': 'Only the poster can view applications for this job'}), 403
+        
+        # Served from (job_id, applied_at); applicant and profile come in the same SELECT
+        applications, pagination = applications_page(
+            JobApplication.query.filter(JobApplication.job_id == job_id)
+            .options(joinedload(JobApplication.applicant).joinedload(User.profile))
+        )
+        
+        application_list = []
+        for application in applications:
+            applicant = application.applicant
+            profile = applicant.profile if applicant else None
+            application_list.append(dict(application.to_dict(), applicant={
+                'id': application.applicant_id,
+                'name': applicant.username if applicant else 'Unknown',
+                'email': applicant.email if applicant else None,
+                'title': profile.title if profile else None,
+                'avatar_url': profile.avatar_url if profile else None
+            }))
+        
+        return jsonify({'applications': application_list, 'pagination': pagination})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Cache invalidation: the category list changes when jobs come, go or change category/status
+@event.listens_for(Job, 'after_insert')
+@event.listens_for(Job, 'after_delete')
+def _job_added_or_removed(mapper, connection, target):
+    cache.invalidate_after_commit(object_session(target), 'job.category')
+
+@event.listens_for(Job, 'after_update')
+def _job_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.category.history.has_changes() or state.attrs.status.history.has_changes():
+        cache.invalidate_after_commit(object_session(target), 'job.category')
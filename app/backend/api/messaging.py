@@ -1,47 +1,77 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from models.message import Message, Conversation
 from models.user import User
 from models.profile import Profile
 from models import db
-from sqlalchemy import desc
+from sqlalchemy import case, desc, func, or_, and_, update
+from services.http_cache import etag_cached, register_cache_control
+from services.realtime import message_hub, TooManyStreams
 from datetime import datetime
 
 messaging_bp = Blueprint('messaging', __name__)
+register_cache_control(messaging_bp)
+
+MAX_MESSAGES_PER_PAGE = 100
+
+def conversations_version():
+    """Cheap stamp for the conversation list.
+
+    Conversation count and summed row versions cover new messages and
+    unread changes; the summed profile versions of the other participants
+    cover avatar and title edits.
+    """
+    user_id = get_jwt_identity()
+    count, conversation_versions, profile_versions = db.session.query(
+        func.count(Conversation.id),
+        func.sum(Conversation.version),
+        func.sum(Profile.version)
+    ).outerjoin(Profile, Profile.user_id == Conversation.other_user_id(user_id)).filter(
+        (Conversation.user1_id == user_id) | (Conversation.user2_id == user_id)
+    ).one()
+    return (user_id, count, conversation_versions, profile_versions)
 
 @messaging_bp.route('/api/messages/conversations', methods=['GET'])
 @jwt_required()
+@etag_cached(conversations_version)
 def get_conversations():
-    """Get all conversations for the current user"""
+    """Get the current user's conversations, most recent first"""
     try:
         user_id = get_jwt_identity()
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 50, type=int)
         
-        # Get conversations where user is either sender or receiver
-        conversations = Conversation.query.filter(
-            (Conversation.user1_id == user_id) | (Conversation.user2_id == user_id)
-        ).all()
+        # One SELECT for the page, with the other participant joined in
+        conversations = Conversation.query_inbox(user_id).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
         
         conversation_list = []
-        for conv in conversations:
-            # Determine the other user in the conversation
-            other_user_id = conv.user2_id if conv.user1_id == user_id else conv.user1_id
-            other_user = User.query.get(other_user_id)
-            
-            if other_user and other_user.profile:
-                conversation_list.append({
-                    'id': conv.id,
-                    'other_user': {
-                        'id': other_user.id,
-                        'name': other_user.username,
-                        'avatar_url': other_user.profile.avatar_url,
-                        'title': other_user.profile.title
-                    },
-                    'last_message': conv.last_message,
-                    'last_message_time': conv.last_message_time.isoformat() if conv.last_message_time else None,
-                    'unread_count': conv.unread_count or 0
-                })
-        
-        return jsonify({'conversations': conversation_list})
+        for conv, other_id, other_name, other_avatar, other_title in conversations.items:
+            conversation_list.append({
+                'id': conv.id,
+                'other_user': {
+                    'id': other_id,
+                    'name': other_name,
+                    'avatar_url': other_avatar,
+                    'title': other_title
+                },
+                'last_message': conv.last_message,
+                'last_message_time': conv.last_message_time.isoformat() if conv.last_message_time else None,
+                'unread_count': conv.unread_count_for(user_id)
+            })
+        
+        return jsonify({
+            'conversations': conversation_list,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': conversations.total,
+                'pages': conversations.pages,
+                'has_next': conversations.has_next,
+                'has_prev': conversations.has_prev
+            }
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -49,9 +79,15 @@ def get_conversations():
 @messaging_bp.route('/api/messages/<int:conversation_id>', methods=['GET'])
 @jwt_required()
 def get_messages(conversation_id):
-    """Get messages for a specific conversation"""
+    """Get a page of messages for a conversation, oldest first.
+
+    Returns the latest `limit` messages; pass the returned
+    pagination.next_before_id as `before_id` to load older ones.
+    """
     try:
         user_id = get_jwt_identity()
+        before_id = request.args.get('before_id', type=int)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_MESSAGES_PER_PAGE)
         
         # Verify user is part of this conversation
         conversation = Conversation.query.filter(
@@ -62,22 +98,50 @@ def get_messages(conversation_id):
         if not conversation:
             return jsonify({'error': 'Conversation not found'}), 404
         
-        # Get messages for this conversation
-        messages = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at).all()
+        # Newest first on (conversation_id, created_at, id), one extra row to
+        # tell whether older messages remain
+        query = Message.query.filter(Message.conversation_id == conversation_id)
+        if before_id is not None:
+            anchor = db.session.query(Message.created_at).filter(
+                Message.id == before_id,
+                Message.conversation_id == conversation_id
+            ).first()
+            if not anchor:
+                return jsonify({'error': 'Invalid before_id'}), 400
+            query = query.filter(or_(
+                Message.created_at < anchor.created_at,
+                and_(Message.created_at == anchor.created_at, Message.id < before_id)
+            ))
+        rows = query.order_by(desc(Message.created_at), desc(Message.id)).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        messages = rows[:limit][::-1]
+        
+        # A conversation has two participants: resolve both names once
+        sender_names = dict(
+            db.session.query(User.id, User.username).filter(
+                User.id.in_([conversation.user1_id, conversation.user2_id])
+            )
+        )
         
         message_list = []
         for msg in messages:
-            sender = User.query.get(msg.sender_id)
             message_list.append({
                 'id': msg.id,
                 'content': msg.content,
                 'sender_id': msg.sender_id,
-                'sender_name': sender.username if sender else 'Unknown',
+                'sender_name': sender_names.get(msg.sender_id, 'Unknown'),
                 'created_at': msg.created_at.isoformat() if msg.created_at else None,
-                'is_own': msg.sender_id == user_id
+                'is_own': msg.sender_id == int(user_id)
             })
         
-        return jsonify({'messages': message_list})
+        return jsonify({
+            'messages': message_list,
+            'pagination': {
+                'limit': limit,
+                'has_more': has_more,
+                'next_before_id': messages[0].id if has_more else None
+            }
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -113,10 +177,35 @@ def send_message(conversation_id):
         
         db.session.add(new_message)
         
-        # Update conversation with last message info
-        conversation.last_message = content
-        conversation.last_message_time = datetime.utcnow()
-        conversation.unread_count = (conversation.unread_count or 0) + 1
+        # Update last message info and bump the recipient's unread counter in
+        # one statement, so concurrent sends cannot lose an increment
+        recipient_unread = (
+            Conversation.user2_unread_count if conversation.user1_id == int(user_id)
+            else Conversation.user1_unread_count
+        )
+        db.session.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values({
+                Conversation.last_message: content,
+                Conversation.last_message_time: datetime.utcnow(),
+                recipient_unread: recipient_unread + 1
+            })
+        )
+        
+        # The UPDATE above flushed the message, so its id is known; push it
+        # to both participants' open streams once the commit succeeds
+        message_hub.publish_after_commit(
+            db.session, [conversation.user1_id, conversation.user2_id], 'message', {
+                'conversation_id': conversation_id,
+                'message': {
+                    'id': new_message.id,
+                    'content': new_message.content,
+                    'sender_id': int(user_id),
+                    'created_at': new_message.created_at.isoformat()
+                }
+            }
+        )
         
         db.session.commit()
         
@@ -127,4 +216,118 @@ def send_message(conversation_id):
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500 
+
+@messaging_bp.route('/api/messages/<int:conversation_id>/read', methods=['POST'])
+@jwt_required()
+def mark_conversation_read(conversation_id):
+    """Mark every message the other participant sent in a conversation as read"""
+    try:
+        user_id = get_jwt_identity()
+        
+        # Verify user is part of this conversation
+        conversation = Conversation.query.filter(
+            (Conversation.id == conversation_id) &
+            ((Conversation.user1_id == user_id) | (Conversation.user2_id == user_id))
+        ).first()
+        
+        if not conversation:
+            return jsonify({'error': 'Conversation not found'}), 404
+        
+        # One bulk UPDATE for the messages, then take the rows it actually
+        # flipped off this side's counter (never below zero), so messages
+        # that arrive concurrently stay counted
+        result = db.session.execute(
+            update(Message)
+            .where(
+                Message.conversation_id == conversation_id,
+                Message.sender_id != int(user_id),
+                Message.is_read.is_(False)
+            )
+            .values(is_read=True)
+            .execution_options(synchronize_session=False)
+        )
+        own_unread = (
+            Conversation.user1_unread_count if conversation.user1_id == int(user_id)
+            else Conversation.user2_unread_count
+        )
+        if result.rowcount:
+            db.session.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values({own_unread: case(
+                    (own_unread > result.rowcount, own_unread - result.rowcount), else_=0
+                )})
+            )
+        message_hub.publish_after_commit(
+            db.session, [conversation.user1_id, conversation.user2_id], 'read', {
+                'conversation_id': conversation_id,
+                'reader_id': int(user_id)
+            }
+        )
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Conversation marked as read',
+            'marked_read': result.rowcount
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@messaging_bp.route('/api/messages/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    """Total unread messages across the current user's conversations"""
+    try:
+        user_id = get_jwt_identity()
+        total = db.session.query(
+            func.coalesce(func.sum(Conversation.unread_column(user_id)), 0)
+        ).filter(
+            (Conversation.user1_id == user_id) | (Conversation.user2_id == user_id)
+        ).scalar()
+        
+        return jsonify({'unread_count': int(total)})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@messaging_bp.route('/api/messages/stream-ticket', methods=['POST'])
+@jwt_required()
+def create_stream_ticket():
+    """Short-lived ticket for opening the event stream without a token in the URL"""
+    return jsonify({
+        'ticket': message_hub.issue_ticket(get_jwt_identity()),
+        'expires_in': message_hub.ticket_ttl
+    })
+
+@messaging_bp.route('/api/messages/stream', methods=['GET'])
+def stream_messages():
+    """Server-sent event stream of the current user's message and read events.
+
+    EventSource cannot set headers, so browsers pass a ticket from
+    POST /api/messages/stream-ticket as ?ticket=; other clients may send the
+    access token in the Authorization header.
+    """
+    ticket = request.args.get('ticket')
+    if ticket:
+        user_id = message_hub.redeem_ticket(ticket)
+        if user_id is None:
+            return jsonify({'error': 'Invalid or expired stream ticket'}), 401
+    else:
+        verify_jwt_in_request()
+        user_id = get_jwt_identity()
+
+    try:
+        subscriber = message_hub.subscribe(user_id)
+    except TooManyStreams:
+        return jsonify({'error': 'Too many open message streams'}), 429
+
+    response = Response(
+        message_hub.stream(subscriber),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(lambda: message_hub.unsubscribe(user_id, subscriber))
+    return response
@@ -1,13 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.post import Post
+from models.post import Post, PostLike
+from models.tag import TagStat, PostTag, normalize_tags
 from models import db
-from sqlalchemy import or_, and_, desc, asc, func
+from services.pagination import keyset_paginate
+from services.view_counter import view_counter
+from services.search import post_search
+from services.cache import cache
+from services.uploads import parse_streaming_form, UploadTooLarge, UploadRejected
+from sqlalchemy import desc, asc, func, update, delete, select, exists, event, inspect
+from sqlalchemy.orm import object_session
+from sqlalchemy.exc import IntegrityError
 import os
-from werkzeug.utils import secure_filename
-import time
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
 import json
-from functools import lru_cache
 
 posts_bp = Blueprint('posts', __name__)
 
@@ -19,31 +26,39 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Cache for frequently accessed data
-@lru_cache(maxsize=128)
+# Cache for frequently accessed data; entries expire after their TTL and are
+# dropped as soon as a committed post write changes what they contain
+@cache.cached('posts:categories', ttl=600, invalidate_on=['post.category'])
 def get_cached_categories():
     """Get all available categories with caching"""
     categories = db.session.query(Post.category).filter(Post.category.isnot(None)).distinct().all()
     return [cat[0] for cat in categories if cat[0]]
 
-@lru_cache(maxsize=128)
+@cache.cached('posts:popular-tags', ttl=300, invalidate_on=['post.tags'])
 def get_cached_popular_tags(limit=50):
     """Get most popular tags with caching"""
-    posts_with_tags = Post.query.filter(Post.tags.isnot(None)).all()
-    tag_counts = {}
-    
-    for post in posts_with_tags:
-        try:
-            tags = json.loads(post.tags)
-            for tag in tags:
-                tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        except:
-            continue
-    
-    # Sort by count and return top tags
-    popular_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+    # tag_stats is maintained on every post write, so this is a single
+    # ORDER BY count DESC LIMIT n over idx_tag_stats_count
+    popular_tags = db.session.query(TagStat.tag, TagStat.count).filter(
+        TagStat.count > 0
+    ).order_by(desc(TagStat.count), TagStat.tag).limit(limit).all()
     return [{'tag': tag, 'count': count} for tag, count in popular_tags]
 
+def filter_by_tags(query, tag_list, mode='any'):
+    """Filter posts through the post_tag index; mode 'all' requires every tag"""
+    if mode == 'all':
+        matching_posts = select(PostTag.post_id).where(
+            PostTag.tag.in_(tag_list)
+        ).group_by(PostTag.post_id).having(func.count(PostTag.tag) == len(tag_list))
+        return query.filter(Post.id.in_(matching_posts))
+    return query.filter(exists().where(PostTag.post_id == Post.id, PostTag.tag.in_(tag_list)))
+
+def parse_tags_param(raw):
+    """Accept tags as a list, a JSON array string or a comma-separated string"""
+    if isinstance(raw, str) and not raw.strip().startswith('['):
+        raw = raw.split(',')
+    return normalize_tags(raw)
+
 # Test endpoint without authentication
 @posts_bp.route('/api/test/posts', methods=['GET'])
 def test_get_posts():
@@ -54,35 +69,41 @@ def test_get_posts():
         per_page = min(request.args.get('per_page', 10, type=int), 50)
         search = request.args.get('search', '').strip()
         category = request.args.get('category', '').strip()
+        sort_by = request.args.get('sort_by', 'created_at')
         
         # Start with base query for public posts only
-        query = Post.query.filter(Post.visibility == 'public')
+        query = Post.query_with_author().filter(Post.visibility == 'public')
         
-        # Apply search filter
+        # Apply full-text search filter
+        relevance = None
         if search:
-            search_filter = or_(
-                Post.title.ilike(f'%{search}%'),
-                Post.content.ilike(f'%{search}%')
-            )
-            query = query.filter(search_filter)
+            query, relevance = post_search.apply(query, search)
         
         # Apply category filter
         if category:
             query = query.filter(Post.category == category)
         
-        # Apply sorting
-        query = query.order_by(desc(Post.created_at))
-        
-        # Execute pagination
-        paginated_posts = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
-        
-        return jsonify({
-            'posts': [post.to_dict() for post in paginated_posts.items],
-            'pagination': {
+        # Cursor mode (newest first) or classic offset pagination
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            posts, next_cursor = keyset_paginate(query, Post.created_at, Post.id, per_page, cursor)
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None
+            }
+        else:
+            if sort_by == 'relevance' and relevance is not None:
+                query = query.order_by(desc(relevance), desc(Post.id))
+            else:
+                query = query.order_by(desc(Post.created_at))
+            paginated_posts = query.paginate(
+                page=page,
+                per_page=per_page,
+                error_out=False
+            )
+            posts = paginated_posts.items
+            pagination = {
                 'page': page,
                 'per_page': per_page,
                 'total': paginated_posts.total,
@@ -92,8 +113,14 @@ def test_get_posts():
                 'next_num': paginated_posts.next_num,
                 'prev_num': paginated_posts.prev_num
             }
+        
+        return jsonify({
+            'posts': [post.to_dict() for post in posts],
+            'pagination': pagination
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error fetching posts: {str(e)}'}), 500
 
@@ -120,41 +147,60 @@ def test_get_popular_tags():
 @jwt_required()
 def create_post():
     user_id = get_jwt_identity()
+    files = MultiDict()
     
     # Handle both JSON and form data
     if request.content_type and 'application/json' in request.content_type:
-        data = request.get_json()
-        title = data.get('title')
-        content = data.get('content')
-        media_file = None
+        form = request.get_json()
+    elif request.content_type and request.content_type.startswith('multipart/form-data'):
+        # Stream uploads to disk with the size and type checks applied per
+        # chunk, instead of letting werkzeug buffer the whole file first
+        try:
+            form, files = parse_streaming_form(request.environ, UPLOAD_FOLDER, MAX_FILE_SIZE)
+        except UploadTooLarge:
+            return jsonify({'message': 'File size exceeds the 16MB limit'}), 400
+        except UploadRejected:
+            return jsonify({'message': 'Invalid file type'}), 400
+        except RequestEntityTooLarge:
+            return jsonify({'message': 'Request is too large'}), 413
     else:
-        title = request.form.get('title')
-        content = request.form.get('content')
-        media_file = request.files.get('media')
+        form = request.form
+    
+    media_file = files.get('media')
+    try:
+        title = form.get('title')
+        content = form.get('content')
+        category = form.get('category')
+        visibility = form.get('visibility')
+        tags = form.get('tags')
 
-    if not title or not content:
-        return jsonify({'message': 'Title and content are required'}), 400
+        if not title or not content:
+            return jsonify({'message': 'Title and content are required'}), 400
+        if visibility and visibility not in ('public', 'private', 'connections'):
+            return jsonify({'message': 'Invalid visibility'}), 400
+        tag_list = parse_tags_param(tags) if tags else []
 
-    media_url = None
-    if media_file:
-        if not allowed_file(media_file.filename):
-            return jsonify({'message': 'Invalid file type'}), 400
-        
-        media_file.seek(0, os.SEEK_END)
-        file_length = media_file.tell()
-        if file_length > MAX_FILE_SIZE:
-            return jsonify({'message': 'File size exceeds the 16MB limit'}), 400
-        media_file.seek(0)
+        media_url = None
+        if media_file:
+            if not allowed_file(media_file.filename):
+                return jsonify({'message': 'Invalid file type'}), 400
+            # Named after the content hash, so re-uploaded media is stored once
+            filename = media_file.stream.commit(prefix='post')
+            media_url = f"/static/uploads/{filename}"
+    finally:
+        # Drop any upload that was not committed above
+        for _, upload in files.items(multi=True):
+            upload.stream.discard()
 
-        ext = media_file.filename.rsplit('.', 1)[1].lower()
-        filename = f"post_{user_id}_{int(time.time())}.{ext}"
-        filename = secure_filename(filename)
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        media_file.save(filepath)
-        media_url = f"/static/uploads/{filename}"
-
-    new_post = Post(title=title, content=content, media_url=media_url, user_id=user_id)
+    new_post = Post(
+        title=title,
+        content=content,
+        media_url=media_url,
+        user_id=user_id,
+        category=category or 'general',
+        visibility=visibility or 'public',
+        tags=json.dumps(tag_list) if tag_list else None
+    )
     db.session.add(new_post)
     db.session.commit()
 
@@ -174,15 +220,12 @@ def get_posts():
     sort_order = request.args.get('sort_order', 'desc')
     
     # Start with base query
-    query = Post.query
+    query = Post.query_with_author()
     
-    # Apply search filter
+    # Apply full-text search filter
+    relevance = None
     if search:
-        search_filter = or_(
-            Post.title.ilike(f'%{search}%'),
-            Post.content.ilike(f'%{search}%')
-        )
-        query = query.filter(search_filter)
+        query, relevance = post_search.apply(query, search)
     
     # Apply category filter
     if category:
@@ -197,36 +240,42 @@ def get_posts():
     
     # Apply tags filter
     if tags:
-        tag_list = [tag.strip() for tag in tags.split(',') if tag.strip()]
+        tag_list = parse_tags_param(tags)
         if tag_list:
-            tag_filters = []
-            for tag in tag_list:
-                tag_filters.append(Post.tags.ilike(f'%"{tag}"%'))
-            query = query.filter(or_(*tag_filters))
+            query = filter_by_tags(query, tag_list, request.args.get('tag_mode', 'any'))
     
-    # Apply sorting
-    sort_column = getattr(Post, sort_by, Post.created_at)
-    if sort_order.lower() == 'asc':
-        query = query.order_by(asc(sort_column))
-    else:
-        query = query.order_by(desc(sort_column))
+    # Cursor pagination walks the (created_at, id) index, so it is only
+    # available for the default newest-first ordering
+    cursor = request.args.get('cursor')
+    if cursor is not None and (sort_by != 'created_at' or sort_order.lower() != 'desc'):
+        return jsonify({'message': 'Cursor pagination only supports sort_by=created_at&sort_order=desc'}), 400
     
     # Execute pagination
     try:
-        paginated_posts = query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
-        
-        # Increment view count for returned posts
-        for post in paginated_posts.items:
-            post.views_count = (post.views_count or 0) + 1
-        db.session.commit()
-        
-        return jsonify({
-            'posts': [post.to_dict() for post in paginated_posts.items],
-            'pagination': {
+        if cursor is not None:
+            posts, next_cursor = keyset_paginate(query, Post.created_at, Post.id, per_page, cursor)
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'has_next': next_cursor is not None
+            }
+        else:
+            # Apply sorting
+            sort_column = getattr(Post, sort_by, Post.created_at)
+            if sort_by == 'relevance' and relevance is not None:
+                query = query.order_by(desc(relevance), desc(Post.id))
+            elif sort_order.lower() == 'asc':
+                query = query.order_by(asc(sort_column))
+            else:
+                query = query.order_by(desc(sort_column))
+            
+            paginated_posts = query.paginate(
+                page=page,
+                per_page=per_page,
+                error_out=False
+            )
+            posts = paginated_posts.items
+            pagination = {
                 'page': page,
                 'per_page': per_page,
                 'total': paginated_posts.total,
@@ -236,15 +285,24 @@ def get_posts():
                 'next_num': paginated_posts.next_num,
                 'prev_num': paginated_posts.prev_num
             }
+        
+        # Count views for returned posts; written back in batches
+        view_counter.record([post.id for post in posts])
+        
+        return jsonify({
+            'posts': [post.to_dict() for post in posts],
+            'pagination': pagination
         }), 200
         
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Error fetching posts: {str(e)}'}), 500
 
 @posts_bp.route('/api/users/<int:user_id>/posts', methods=['GET'])
 @jwt_required()
 def get_user_posts(user_id):
-    posts = Post.query.filter_by(user_id=user_id).order_by(Post.created_at.desc()).all()
+    posts = Post.query_with_author().filter(Post.user_id == user_id).order_by(Post.created_at.desc()).all()
     return jsonify([post.to_dict() for post in posts]), 200
 
 @posts_bp.route('/api/posts/categories', methods=['GET'])
@@ -268,39 +326,105 @@ def get_popular_tags():
     except Exception as e:
         return jsonify({'message': f'Error fetching popular tags: {str(e)}'}), 500
 
+@posts_bp.route('/api/posts/liked', methods=['GET'])
+@jwt_required()
+def get_liked_posts():
+    """Return which of the given post ids (?ids=1,2,3) the current user has liked"""
+    user_id = get_jwt_identity()
+    ids = request.args.get('ids', '').strip()
+    try:
+        post_ids = [int(i) for i in ids.split(',') if i.strip()][:100]
+    except ValueError:
+        return jsonify({'message': 'ids must be a comma-separated list of post ids'}), 400
+    
+    liked_ids = PostLike.liked_post_ids(user_id, post_ids)
+    return jsonify({'liked': [post_id for post_id in post_ids if post_id in liked_ids]}), 200
+
+def get_likes_count(post_id):
+    return db.session.query(Post.likes_count).filter(Post.id == post_id).scalar() or 0
+
 @posts_bp.route('/api/posts/<int:post_id>/like', methods=['POST'])
 @jwt_required()
 def like_post(post_id):
-    """Like or unlike a post"""
+    """Like a post; liking it again is a no-op"""
     user_id = get_jwt_identity()
     
     try:
-        post = Post.query.get_or_404(post_id)
+        if not db.session.query(Post.id).filter(Post.id == post_id).first():
+            return jsonify({'message': 'Post not found'}), 404
+        
+        # The unique (post_id, user_id) key rejects a second like
+        try:
+            db.session.add(PostLike(post_id=post_id, user_id=int(user_id)))
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({
+                'message': 'Post already liked',
+                'likes_count': get_likes_count(post_id)
+            }), 200
         
-        # Check if user already liked the post
-        # For now, we'll just increment the likes count
-        # In a real implementation, you'd have a separate likes table
-        post.likes_count = (post.likes_count or 0) + 1
+        # Single-statement increment, issued last so the post row is
+        # only locked for the rest of this short transaction
+        db.session.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(likes_count=func.coalesce(Post.likes_count, 0) + 1)
+        )
         db.session.commit()
         
         return jsonify({
             'message': 'Post liked successfully',
-            'likes_count': post.likes_count
+            'likes_count': get_likes_count(post_id)
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'message': f'Error liking post: {str(e)}'}), 500
 
-# Cache invalidation functions
-def invalidate_cache():
-    """Invalidate all caches when posts are modified"""
-    get_cached_categories.cache_clear()
-    get_cached_popular_tags.cache_clear()
+@posts_bp.route('/api/posts/<int:post_id>/like', methods=['DELETE'])
+@jwt_required()
+def unlike_post(post_id):
+    """Remove the current user's like; unliking twice is a no-op"""
+    user_id = get_jwt_identity()
+    
+    try:
+        result = db.session.execute(
+            delete(PostLike).where(PostLike.post_id == post_id, PostLike.user_id == int(user_id))
+        )
+        if result.rowcount:
+            db.session.execute(
+                update(Post)
+                .where(Post.id == post_id, Post.likes_count > 0)
+                .values(likes_count=Post.likes_count - 1)
+            )
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Post unliked successfully' if result.rowcount else 'Post was not liked',
+            'likes_count': get_likes_count(post_id)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error unliking post: {str(e)}'}), 500
+
+# Cache invalidation: report which cached lookups a post write affects
+@event.listens_for(Post, 'after_insert')
+@event.listens_for(Post, 'after_delete')
+def _post_added_or_removed(mapper, connection, target):
+    events = ['post.category']
+    if target.tags:
+        events.append('post.tags')
+    cache.invalidate_after_commit(object_session(target), *events)
 
-# Update create_post to invalidate cache
-@posts_bp.after_request
-def after_request(response):
-    """Invalidate cache after POST requests"""
-    if request.method == 'POST' and request.endpoint in ['posts.create_post', 'posts.like_post']:
-        invalidate_cache()
-    return response
+@event.listens_for(Post, 'after_update')
+def _post_updated(mapper, connection, target):
+    state = inspect(target)
+    events = []
+    if state.attrs.category.history.has_changes():
+        events.append('post.category')
+    if state.attrs.tags.history.has_changes():
+        events.append('post.tags')
+    if events:
+        cache.invalidate_after_commit(object_session(target), *events)
@@ -5,11 +5,16 @@ from models.profile import Profile
 from models import db
 import os
 from werkzeug.utils import secure_filename
-from PIL import Image
-import time
+import uuid
 import magic
+from flask import current_app
+from services.image_pipeline import image_pipeline, PipelineBusy, discard_file
+from services.collection_sync import sync_collection
+from services.http_cache import etag_cached, register_cache_control
+from services.current_user import current_user_loader
 
 profile_bp = Blueprint('profile', __name__)
+register_cache_control(profile_bp)
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../static/uploads')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
@@ -33,71 +38,32 @@ def validate_image(file):
         return False
     return True
 
+def to_year(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+def profile_version():
+    """Cheap stamp for GET /api/profile: the profile's version counter"""
+    user_id = get_jwt_identity()
+    version = db.session.query(Profile.version).filter(Profile.user_id == user_id).scalar()
+    return None if version is None else (user_id, version)
+
 @profile_bp.route('/api/profile', methods=['GET'])
 @jwt_required()
+@etag_cached(profile_version)
 def get_profile():
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        profile = Profile.query.filter_by(user_id=user_id).first()
+        profile = Profile.query_aggregate().filter(Profile.user_id == user_id).first()
         
-        if not user:
-            return jsonify({'message': 'User not found'}), 404
         if not profile:
+            if not current_user_loader.user():
+                return jsonify({'message': 'User not found'}), 404
             return jsonify({'message': 'Profile not found for user'}), 404
-            
-        # Fetch skills as array
-        from models.profile import Skill, Experience, Education, Activity
-        skills = [s.name for s in Skill.query.filter_by(profile_id=profile.id).all()]
-        # Fetch languages as array (store as comma-separated in profile.languages)
-        languages = (profile.languages or '').split(',') if hasattr(profile, 'languages') else []
-        # Fetch experience as list of dicts
-        experience = [
-            {
-                'company': e.company,
-                'title': e.title,
-                'start': str(e.start_date) if e.start_date else '',
-                'end': str(e.end_date) if e.end_date else '',
-            }
-            for e in Experience.query.filter_by(profile_id=profile.id).all()
-        ]
-        # Fetch education as list of dicts
-        education = [
-            {
-                'school': ed.school,
-                'degree': ed.degree,
-                'start': str(ed.start_year) if ed.start_year else '',
-                'end': str(ed.end_year) if ed.end_year else '',
-            }
-            for ed in Education.query.filter_by(profile_id=profile.id).all()
-        ]
-        # Fetch activity as list of dicts
-        activity = [
-            {
-                'type': a.type,
-                'content': a.content,
-                'date': a.date,
-            }
-            for a in Activity.query.filter_by(profile_id=profile.id).order_by(Activity.id.desc()).all()
-        ]
-        return jsonify({
-            'id': user.id,
-            'name': user.username,
-            'email': user.email,
-            'title': getattr(profile, 'title', ''),
-            'bio': profile.bio,
-            'location': profile.location,
-            'skills': skills,
-            'languages': languages,
-            'experience': experience,
-            'education': education,
-            'contact': {'email': user.email, 'phone': getattr(profile, 'phone', '')},
-            'activity': activity,
-            'connections': getattr(profile, 'connections', 0),
-            'mutualConnections': getattr(profile, 'mutualConnections', 0),
-            'avatarUrl': profile.avatar_url or '',
-            'socialLinks': [],
-        })
+        
+        return jsonify(profile.to_dict())
     except Exception as e:
         return jsonify({'message': f'Error fetching profile: {str(e)}'}), 500
 
@@ -110,72 +76,21 @@ def get_profile_test():
         if not user:
             return jsonify({'message': 'No users found in database'}), 404
             
-        profile = Profile.query.filter_by(user_id=user.id).first()
+        profile = Profile.query_aggregate().filter(Profile.user_id == user.id).first()
         if not profile:
             return jsonify({'message': 'No profile found for first user'}), 404
-            
-        # Fetch skills as array
-        from models.profile import Skill, Experience, Education, Activity
-        skills = [s.name for s in Skill.query.filter_by(profile_id=profile.id).all()]
-        # Fetch languages as array (store as comma-separated in profile.languages)
-        languages = (profile.languages or '').split(',') if hasattr(profile, 'languages') else []
-        # Fetch experience as list of dicts
-        experience = [
-            {
-                'company': e.company,
-                'title': e.title,
-                'start': str(e.start_date) if e.start_date else '',
-                'end': str(e.end_date) if e.end_date else '',
-            }
-            for e in Experience.query.filter_by(profile_id=profile.id).all()
-        ]
-        # Fetch education as list of dicts
-        education = [
-            {
-                'school': ed.school,
-                'degree': ed.degree,
-                'start': str(ed.start_year) if ed.start_year else '',
-                'end': str(ed.end_year) if ed.end_year else '',
-            }
-            for ed in Education.query.filter_by(profile_id=profile.id).all()
-        ]
-        # Fetch activity as list of dicts
-        activity = [
-            {
-                'type': a.type,
-                'content': a.content,
-                'date': a.date,
-            }
-            for a in Activity.query.filter_by(profile_id=profile.id).order_by(Activity.id.desc()).all()
-        ]
         
-        return jsonify({
-            'id': user.id,
-            'name': user.username,
-            'email': user.email,
-            'title': getattr(profile, 'title', ''),
-            'bio': profile.bio,
-            'location': profile.location,
-            'skills': skills,
-            'languages': languages,
-            'experience': experience,
-            'education': education,
-            'contact': {'email': user.email, 'phone': getattr(profile, 'phone', '')},
-            'activity': activity,
-            'connections': getattr(profile, 'connections', 0),
-            'mutualConnections': getattr(profile, 'mutualConnections', 0),
-            'avatarUrl': profile.avatar_url or '',
-            'socialLinks': [],
-        })
+        return jsonify(profile.to_dict())
     except Exception as e:
         return jsonify({'message': f'Error fetching profile: {str(e)}'}), 500
 
 @profile_bp.route('/api/profile', methods=['PUT'])
 @jwt_required()
 def update_profile():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    profile = Profile.query.filter_by(user_id=user_id).first()
+    # Changes are detected by comparing with the loaded values, so read them
+    # from the database rather than the cross-request cache
+    user = current_user_loader.user(refresh=True)
+    profile = current_user_loader.profile(refresh=True)
     if not user or not profile:
         return jsonify({'message': 'Profile not found'}), 404
 
@@ -203,6 +118,8 @@ def update_profile():
             languages = json.loads(languages_raw) if languages_raw else []
         except Exception:
             languages = []
+        education = None
+        activity = None
     else:
         data = request.get_json()
         name = data.get('name')
@@ -244,40 +161,49 @@ def update_profile():
     if location is not None:
         profile.location = location
 
-    # Update skills (replace all for simplicity)
-    from models.profile import Skill
+    # Update child collections by diffing against the stored rows, so only
+    # entries that actually changed are written
+    from models.profile import Skill, Education, Activity
+    changed = db.session.is_modified(user) or db.session.is_modified(profile)
     if skills is not None:
-        Skill.query.filter_by(profile_id=profile.id).delete()
-        for skill_name in skills:
-            if skill_name:
-                db.session.add(Skill(profile_id=profile.id, name=skill_name))
+        changed |= any(sync_collection(
+            Skill, profile.skills,
+            [{'name': skill_name} for skill_name in skills if skill_name],
+            ['name'], profile_id=profile.id
+        ))
 
-    # Update education (replace all for simplicity)
-    from models.profile import Education
     if education is not None:
-        Education.query.filter_by(profile_id=profile.id).delete()
-        for edu in education:
-            if edu.get('school') or edu.get('degree'):
-                db.session.add(Education(
-                    profile_id=profile.id,
-                    school=edu.get('school', ''),
-                    degree=edu.get('degree', ''),
-                    start_year=edu.get('start', None),
-                    end_year=edu.get('end', None)
-                ))
+        changed |= any(sync_collection(
+            Education, profile.educations,
+            [
+                {
+                    'school': edu.get('school', ''),
+                    'degree': edu.get('degree', ''),
+                    'start_year': to_year(edu.get('start')),
+                    'end_year': to_year(edu.get('end'))
+                }
+                for edu in education if edu.get('school') or edu.get('degree')
+            ],
+            ['school', 'degree', 'start_year', 'end_year'], profile_id=profile.id
+        ))
 
-    # Update activity (replace all for simplicity)
-    from models.profile import Activity
     if activity is not None:
-        Activity.query.filter_by(profile_id=profile.id).delete()
-        for act in activity:
-            if act.get('type') or act.get('content'):
-                db.session.add(Activity(
-                    profile_id=profile.id,
-                    type=act.get('type', ''),
-                    content=act.get('content', ''),
-                    date=act.get('date', '')
-                ))
+        changed |= any(sync_collection(
+            Activity, profile.activities,
+            [
+                {
+                    'type': act.get('type', ''),
+                    'content': act.get('content', ''),
+                    'date': act.get('date', '')
+                }
+                for act in activity if act.get('type') or act.get('content')
+            ],
+            ['type', 'content', 'date'], newest_first=True, profile_id=profile.id
+        ))
+
+    # New version stamp for the profile ETag whenever anything was written
+    if changed:
+        profile.version = Profile.version + 1
 
     db.session.commit()
     response = {'message': 'Profile updated successfully'}
@@ -289,8 +215,8 @@ def update_profile():
 @jwt_required()
 def upload_profile_image():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    profile = Profile.query.filter_by(user_id=user_id).first()
+    user = current_user_loader.user()
+    profile = current_user_loader.profile()
     if not user or not profile:
         return jsonify({'message': 'Profile not found'}), 404
     if 'image' not in request.files:
@@ -302,23 +228,42 @@ def upload_profile_image():
         return jsonify({'message': 'Invalid file type or size'}), 400
     # Secure file naming
     ext = file.filename.rsplit('.', 1)[1].lower()
-    filename = f"profile_{user_id}_{int(time.time())}.{ext}"
-    filename = secure_filename(filename)
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    # Image processing: compression, resizing, thumbnail, format conversion
-    image = Image.open(file)
-    image = image.convert('RGB')
-    image.thumbnail((400, 400))  # Resize
-    image.save(filepath, format='JPEG', quality=85, optimize=True)  # Compression
-    # Optionally, generate thumbnail
-    thumb_path = os.path.join(UPLOAD_FOLDER, f"thumb_{filename}")
-    image.thumbnail((100, 100))
-    image.save(thumb_path, format='JPEG', quality=70, optimize=True)
-    # Update profile with image URL (relative path)
-    profile.avatar_url = f"/static/uploads/{filename}"
-    db.session.commit()
-    return jsonify({'imageUrl': profile.avatar_url}), 200
+    basename = secure_filename(f"profile_{user_id}_{uuid.uuid4().hex}")
+    # The original is kept outside static/ (it may carry EXIF/GPS metadata)
+    # and deleted by the pipeline once the renditions are written
+    raw_folder = current_app.config['IMAGE_PIPELINE_RAW_FOLDER']
+    os.makedirs(raw_folder, exist_ok=True)
+    raw_path = os.path.join(raw_folder, f"{basename}.{ext}")
+    file.save(raw_path)
+    # Resizing, compression and format conversion (400px and 100px JPEG,
+    # 400px WebP) run in the background; avatar_url switches once they are done
+    try:
+        job_id = image_pipeline.submit(profile.id, user.id, raw_path, UPLOAD_FOLDER, basename)
+    except PipelineBusy:
+        discard_file(raw_path)
+        response = jsonify({'message': 'Image processing is busy, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    # No imageUrl yet: the renditions do not exist until the job is done,
+    # and statusUrl reports it then
+    return jsonify({
+        'status': 'pending',
+        'jobId': job_id,
+        'statusUrl': f"/api/profile/image/{job_id}"
+    }), 202
+
+@profile_bp.route('/api/profile/image/<job_id>', methods=['GET'])
+@jwt_required()
+def get_profile_image_status(job_id):
+    """Get the processing state of an uploaded profile image"""
+    job = image_pipeline.status(job_id)
+    if not job or str(job['user_id']) != str(get_jwt_identity()):
+        return jsonify({'message': 'Image job not found'}), 404
+    return jsonify({
+        'status': job['status'],
+        'imageUrl': job['imageUrl'],
+        'renditions': job.get('renditions', {})
+    }), 200
 
 # Serve uploaded profile images
 @profile_bp.route('/static/uploads/<path:filename>')
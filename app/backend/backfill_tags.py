@@ -0,0 +1,26 @@
+# backfill_tags.py
+"""
+Script to rebuild the post_tag rows and tag_stats counters from the JSON tags
+stored on every post. Run this once after creating the tables; afterwards both
+are kept up to date whenever a post is created, edited or deleted.
+"""
+from collections import Counter
+from models import db
+from models.post import Post
+from models.tag import TagStat, PostTag, normalize_tags
+from main import app
+
+with app.app_context():
+    counts = Counter()
+    post_tags = []
+    for post_id, tags in db.session.query(Post.id, Post.tags).filter(Post.tags.isnot(None)).yield_per(1000):
+        tag_list = normalize_tags(tags)
+        counts.update(tag_list)
+        post_tags.extend({'post_id': post_id, 'tag': tag} for tag in tag_list)
+
+    PostTag.query.delete()
+    TagStat.query.delete()
+    db.session.bulk_insert_mappings(PostTag, post_tags)
+    db.session.bulk_insert_mappings(TagStat, [{'tag': tag, 'count': count} for tag, count in counts.items()])
+    db.session.commit()
+    print(f"Backfilled {len(post_tags)} post tags and counters for {len(counts)} tags.")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Check that cursor pagination walks every post exactly once.
+
+Runs the app against a throwaway SQLite file with posts created in the same
+second, both by the database default (stored without microseconds) and by
+Python datetimes (stored with them).
+"""
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+directory = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'pagination.db')}"
+
+from flask_jwt_extended import create_access_token
+from main import app
+from models import db
+from models.user import User
+from models.profile import Profile
+from models.post import Post
+from services.view_counter import view_counter
+
+def walk(client, url, token, per_page):
+    """Post ids of every page of a cursor-paginated endpoint, page by page"""
+    pages, cursor = [], ''
+    while cursor is not None:
+        response = client.get(f'{url}?per_page={per_page}&cursor={cursor}',
+                              headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        pages.append([post['id'] for post in body['posts']])
+        cursor = body['pagination']['next_cursor']
+        assert len(pages) <= 10, f'pagination does not advance: {pages}'
+    return pages
+
+def check_keyset_pagination():
+    with app.app_context():
+        db.create_all()
+        user = User(username='author', email='author@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Profile(user_id=user.id))
+        # Same second: three from the server default, two from Python
+        for number in range(3):
+            db.session.add(Post(title=f'default {number}', content='x', user_id=user.id))
+        moment = datetime.utcnow().replace(microsecond=0)
+        for number in range(2):
+            db.session.add(Post(title=f'python {number}', content='x', user_id=user.id, created_at=moment))
+        db.session.commit()
+        expected = [post.id for post in Post.query.order_by(Post.created_at.desc(), Post.id.desc())]
+        token = create_access_token(identity=str(user.id))
+
+    client = app.test_client()
+    for url in ('/api/posts', '/api/feed'):
+        pages = walk(client, url, token, per_page=2)
+        walked = [post_id for page in pages for post_id in page]
+        assert walked == expected, f'{url}: {pages} != {expected}'
+        print(f'✅ {url} pages {pages} cover every post once')
+
+if __name__ == '__main__':
+    try:
+        check_keyset_pagination()
+    finally:
+        # Write the recorded views before the database goes away
+        view_counter.flush()
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Check that GET reads reach the replica bind and writes the primary.
+
+Runs the app against two throwaway SQLite files. The replica is a copy of
+the primary taken before a post is added, so which posts a GET returns
+shows which database served it.
+"""
+
+import os
+import shutil
+import tempfile
+
+directory = tempfile.mkdtemp()
+primary_path = os.path.join(directory, 'primary.db')
+replica_path = os.path.join(directory, 'replica.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{primary_path}'
+os.environ['DATABASE_REPLICA_URL'] = f'sqlite:///{replica_path}'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+
+from flask_jwt_extended import create_access_token
+from main import app
+from models import db
+from models.user import User
+from models.profile import Profile
+from models.post import Post
+from services.cache import cache
+from services.view_counter import view_counter
+
+def post_titles(client, token):
+    response = client.get('/api/posts', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200, response.get_json()
+    return {post['title'] for post in response.get_json()['posts']}
+
+def check_replica_routing():
+    with app.app_context():
+        db.create_all()
+        for name in ('writer', 'reader'):
+            user = User(username=name, email=f'{name}@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Profile(user_id=user.id))
+        db.session.add(Post(title='replicated', content='on both', user_id=1))
+        db.session.commit()
+        db.engine.dispose()
+        shutil.copyfile(primary_path, replica_path)
+
+        # Not replicated yet: only the primary has it
+        db.session.add(Post(title='primary only', content='lagging', user_id=1))
+        db.session.commit()
+
+        writer = create_access_token(identity='1')
+        reader = create_access_token(identity='2')
+
+    client = app.test_client()
+    assert post_titles(client, reader) == {'replicated'}, 'GET should read from the replica'
+    print('✅ GET /api/posts reads from the replica')
+
+    response = client.post('/api/posts', json={'title': 'fresh', 'content': 'new post'},
+                           headers={'Authorization': f'Bearer {writer}'})
+    assert response.status_code == 201, response.get_json()
+    with app.app_context():
+        assert Post.query.filter_by(title='fresh').count() == 1, 'write should reach the primary'
+    print('✅ POST /api/posts writes to the primary')
+
+    assert post_titles(client, writer) == {'replicated', 'primary only', 'fresh'}, \
+        'the writer should be pinned to the primary'
+    assert post_titles(client, reader) == {'replicated'}, 'other users should stay on the replica'
+    print('✅ The writer reads from the primary right after writing')
+
+    cache.delete('db-primary-pin:1')
+    assert post_titles(client, writer) == {'replicated'}, 'the pin should expire'
+    print('✅ The writer returns to the replica once the pin expires')
+
+if __name__ == '__main__':
+    try:
+        check_replica_routing()
+    finally:
+        # Write the recorded views before the databases go away
+        view_counter.flush()
+        shutil.rmtree(directory, ignore_errors=True)
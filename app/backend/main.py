@@ -9,6 +9,13 @@ load_dotenv()
 
 # Import models and db
 from models import db
+from services.view_counter import view_counter
+from services.search import post_search
+from services.cache import cache
+from services.image_pipeline import image_pipeline
+from services.realtime import message_hub
+from services.password_hasher import password_hasher
+from services.current_user import current_user_loader
 from api.auth import auth_bp
 from api.profile import profile_bp
 from api.posts import posts_bp
@@ -16,43 +23,61 @@ from api.feed import feed_bp
 from api.messaging import messaging_bp
 from api.jobs import jobs_bp
 
-# Create Flask app
-app = Flask(__name__)
-app.config.from_object(Config)
+def create_app():
+    """Application factory function"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    
+    # Initialize extensions
+    CORS(app, origins=['http://localhost:5173', 'http://localhost:5174', 'http://localhost:5175'], supports_credentials=True)
+    db.init_app(app)
+    view_counter.init_app(app)
+    post_search.init_app(app)
+    cache.init_app(app)
+    image_pipeline.init_app(app)
+    message_hub.init_app(app)
+    password_hasher.init_app(app)
+    current_user_loader.init_app(app)
+    JWTManager(app)  # Initialize JWTManager here
+    
+    # Register Blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(profile_bp)
+    app.register_blueprint(posts_bp)
+    app.register_blueprint(feed_bp)
+    app.register_blueprint(messaging_bp)
+    app.register_blueprint(jobs_bp)
+    return app
 
-# Initialize extensions
-CORS(app, origins=['http://localhost:5173', 'http://localhost:5174', 'http://localhost:5175'], supports_credentials=True)
-db.init_app(app)
-JWTManager(app)  # Initialize JWTManager here
+def __getattr__(name):
+    """Build the shared app on first use of main.app (`from main import app`, gunicorn main:app).
 
-def setup_database():
+    Importing this module alone builds nothing: the password hashing pool's
+    spawned workers re-import it as __mp_main__ when the server runs via
+    `python main.py`, and must not start a second app with its own threads.
+    """
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def setup_database(app):
     """Setup database tables"""
     with app.app_context():
         # Import models after app context is created
         from models.user import User
         from models.profile import Profile, Skill, Experience, Education
-        from models.post import Post
+        from models.post import Post, PostLike
+        from models.tag import TagStat, PostTag
         from models.job import Job, JobApplication
         from models.message import Message, Conversation
         
         db.create_all()
         print("✅ Database tables created successfully!")
 
-# Register Blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(profile_bp)
-app.register_blueprint(posts_bp)
-app.register_blueprint(feed_bp)
-app.register_blueprint(messaging_bp)
-app.register_blueprint(jobs_bp)
-
-# Create a function to initialize the app
-def create_app():
-    """Application factory function"""
-    return app
-
 if __name__ == '__main__':
+    app = create_app()
     # Setup database tables
-    setup_database()
+    setup_database(app)
     # Run the app
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
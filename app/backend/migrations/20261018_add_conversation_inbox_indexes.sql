@@ -0,0 +1,5 @@
+-- Add composite indexes for the inbox query (conversations by participant, newest first)
+-- Migration: 20261018_add_conversation_inbox_indexes.sql
+
+CREATE INDEX `idx_conversation_user1_last_message` ON `conversation` (`user1_id`, `last_message_time`);
+CREATE INDEX `idx_conversation_user2_last_message` ON `conversation` (`user2_id`, `last_message_time`);
@@ -0,0 +1,19 @@
+-- Replace the shared conversation.unread_count with one counter per participant
+-- Migration: 20261018_add_conversation_unread_counts.sql
+
+ALTER TABLE `conversation`
+    ADD COLUMN `user1_unread_count` INT NOT NULL DEFAULT 0,
+    ADD COLUMN `user2_unread_count` INT NOT NULL DEFAULT 0;
+
+-- Backfill from the messages each side has not read yet
+UPDATE `conversation` c
+SET c.`user1_unread_count` = (
+        SELECT COUNT(*) FROM `message` m
+        WHERE m.`conversation_id` = c.`id` AND m.`sender_id` = c.`user2_id` AND m.`is_read` = FALSE
+    ),
+    c.`user2_unread_count` = (
+        SELECT COUNT(*) FROM `message` m
+        WHERE m.`conversation_id` = c.`id` AND m.`sender_id` = c.`user1_id` AND m.`is_read` = FALSE
+    );
+
+ALTER TABLE `conversation` DROP COLUMN `unread_count`;
@@ -0,0 +1,10 @@
+-- Add indexes for the applicant and job-poster application dashboards
+-- Migration: 20261018_add_job_application_indexes.sql
+-- unique_job_applicant (job_id, applicant_id) already exists from 20250714_add_job_and_message_tables.sql
+
+CREATE INDEX `idx_job_application_applicant_applied` ON `job_application` (`applicant_id`, `applied_at`);
+CREATE INDEX `idx_job_application_job_applied` ON `job_application` (`job_id`, `applied_at`);
+
+-- Covered by the composite indexes above
+DROP INDEX `idx_job_application_applicant_id` ON `job_application`;
+DROP INDEX `idx_job_application_job_id` ON `job_application`;
@@ -0,0 +1,17 @@
+-- Add composite indexes and a normalized location key for job search
+-- Migration: 20261018_add_job_search_indexes.sql
+
+ALTER TABLE `job`
+    ADD COLUMN `location_key` VARCHAR(200);
+
+-- Same normalization as models.job.normalize_location: lowercase, single spaces
+UPDATE `job`
+SET `location_key` = LOWER(TRIM(REGEXP_REPLACE(`location`, '[[:space:]]+', ' ')));
+
+CREATE INDEX `idx_job_status_created` ON `job` (`status`, `created_at`);
+CREATE INDEX `idx_job_status_category_created` ON `job` (`status`, `category`, `created_at`);
+CREATE INDEX `idx_job_status_location_key` ON `job` (`status`, `location_key`);
+
+-- Covered by the composite indexes above / unusable for the old %location% match
+DROP INDEX `idx_job_status` ON `job`;
+DROP INDEX `idx_job_location` ON `job`;
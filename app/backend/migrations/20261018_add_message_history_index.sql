@@ -0,0 +1,4 @@
+-- Add composite index for paging through a conversation's message history
+-- Migration: 20261018_add_message_history_index.sql
+
+CREATE INDEX `idx_message_conversation_created_id` ON `message` (`conversation_id`, `created_at`, `id`);
@@ -0,0 +1,4 @@
+-- Add FULLTEXT index used by post search (SEARCH_BACKEND=mysql)
+-- Migration: 20261018_add_post_fulltext_index.sql
+
+ALTER TABLE `post` ADD FULLTEXT INDEX `ft_post_title_content` (`title`, `content`);
@@ -0,0 +1,13 @@
+-- Add post_like table for per-user likes
+-- Migration: 20261018_add_post_like_table.sql
+
+CREATE TABLE IF NOT EXISTS `post_like` (
+    `id` INT AUTO_INCREMENT PRIMARY KEY,
+    `post_id` INT NOT NULL,
+    `user_id` INT NOT NULL,
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (`post_id`) REFERENCES `post`(`id`) ON DELETE CASCADE,
+    FOREIGN KEY (`user_id`) REFERENCES `user`(`id`) ON DELETE CASCADE,
+    UNIQUE KEY `uq_post_like_post_user` (`post_id`, `user_id`),
+    INDEX `idx_post_like_user_post` (`user_id`, `post_id`)
+);
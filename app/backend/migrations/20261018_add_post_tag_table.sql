@@ -0,0 +1,21 @@
+-- Add normalized post_tag table and backfill it from post.tags (MySQL 8+)
+-- Migration: 20261018_add_post_tag_table.sql
+-- On other databases run: python backfill_tags.py
+
+CREATE TABLE IF NOT EXISTS `post_tag` (
+    `post_id` INT NOT NULL,
+    `tag` VARCHAR(64) NOT NULL,
+    PRIMARY KEY (`post_id`, `tag`),
+    FOREIGN KEY (`post_id`) REFERENCES `post`(`id`) ON DELETE CASCADE,
+    INDEX `idx_post_tag_tag_post` (`tag`, `post_id`)
+);
+
+-- Expand the JSON array in post.tags into one row per tag
+INSERT IGNORE INTO `post_tag` (`post_id`, `tag`)
+SELECT p.`id`, LEFT(LOWER(TRIM(jt.`tag`)), 64)
+FROM (
+    SELECT `id`, `tags` FROM `post`
+    WHERE `tags` IS NOT NULL AND JSON_VALID(`tags`) AND JSON_TYPE(`tags`) = 'ARRAY'
+) AS p,
+JSON_TABLE(p.`tags`, '$[*]' COLUMNS (`tag` VARCHAR(255) PATH '$')) AS jt
+WHERE jt.`tag` IS NOT NULL AND TRIM(jt.`tag`) <> '';
@@ -0,0 +1,5 @@
+-- Add a version counter to profiles for ETag validation
+-- Migration: 20261018_add_profile_version.sql
+
+ALTER TABLE `profiles`
+    ADD COLUMN `version` INT NOT NULL DEFAULT 1;
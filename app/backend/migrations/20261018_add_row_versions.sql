@@ -0,0 +1,7 @@
+-- Add row version counters used for ETag validation
+-- Migration: 20261018_add_row_versions.sql
+-- updated_at is only second-precise; version changes on every UPDATE
+
+ALTER TABLE `post` ADD COLUMN `version` INT NOT NULL DEFAULT 1;
+ALTER TABLE `job` ADD COLUMN `version` INT NOT NULL DEFAULT 1;
+ALTER TABLE `conversation` ADD COLUMN `version` INT NOT NULL DEFAULT 1;
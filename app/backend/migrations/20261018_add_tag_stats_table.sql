@@ -0,0 +1,14 @@
+-- Add tag_stats counter table for popular tags and fill it from post_tag
+-- Migration: 20261018_add_tag_stats_table.sql
+-- Runs after 20261018_add_post_tag_table.sql; on other databases run: python backfill_tags.py
+
+CREATE TABLE IF NOT EXISTS `tag_stats` (
+    `tag` VARCHAR(64) NOT NULL PRIMARY KEY,
+    `count` INT NOT NULL DEFAULT 0,
+    INDEX `idx_tag_stats_count` (`count`)
+);
+
+-- Rebuild the tag counters from the normalized rows
+DELETE FROM `tag_stats`;
+INSERT INTO `tag_stats` (`tag`, `count`)
+SELECT `tag`, COUNT(*) FROM `post_tag` GROUP BY `tag`;
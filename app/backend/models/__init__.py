@@ -1,10 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+from .routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # Import all models to ensure they are registered with SQLAlchemy
 from .user import User
 from .profile import Profile, Skill, Experience, Education, Activity
-from .post import Post
+from .post import Post, PostLike
+from .tag import TagStat, PostTag
 from .job import Job, JobApplication
 from .message import Message, Conversation
\ No newline at end of file
@@ -1,6 +1,12 @@
 from models import db
+from sqlalchemy import Index, UniqueConstraint, event, literal_column
+from sqlalchemy.orm import contains_eager
 from datetime import datetime
 
+def normalize_location(location):
+    """Lowercase a location and collapse its whitespace for prefix matching"""
+    return ' '.join((location or '').lower().split())
+
 class Job(db.Model):
     __tablename__ = 'job'
     
@@ -8,6 +14,7 @@ class Job(db.Model):
     title = db.Column(db.String(200), nullable=False)
     company = db.Column(db.String(200), nullable=False)
     location = db.Column(db.String(200), nullable=False)
+    location_key = db.Column(db.String(200))  # normalize_location(location), kept in sync by a listener
     category = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     requirements = db.Column(db.Text)
@@ -19,10 +26,44 @@ class Job(db.Model):
     posted_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=literal_column('version') + 1)  # Row version for ETags, bumped by every UPDATE
     
     # Relationships
     applications = db.relationship('JobApplication', backref='job', lazy=True)
     poster = db.relationship('User', backref='posted_jobs')
+    
+    # Job board queries always filter on status and sort newest first
+    __table_args__ = (
+        Index('idx_job_status_created', 'status', 'created_at'),
+        Index('idx_job_status_category_created', 'status', 'category', 'created_at'),
+        Index('idx_job_status_location_key', 'status', 'location_key'),
+    )
+    
+    @classmethod
+    def query_with_poster(cls):
+        """Query jobs with the poster's User row joined into the same SELECT"""
+        return cls.query.outerjoin(cls.poster).options(contains_eager(cls.poster))
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'company': self.company,
+            'location': self.location,
+            'category': self.category,
+            'description': self.description,
+            'requirements': self.requirements,
+            'salary_min': self.salary_min,
+            'salary_max': self.salary_max,
+            'employment_type': self.employment_type,
+            'experience_level': self.experience_level,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'posted_by': {
+                'id': self.posted_by,
+                'name': self.poster.username if self.poster else 'Unknown'
+            }
+        }
 
 class JobApplication(db.Model):
     __tablename__ = 'job_application'
@@ -38,4 +79,37 @@ class JobApplication(db.Model):
     
     # Relationships
     applicant = db.relationship('User', backref='job_applications')
+    
+    # One application per user and job; dashboards list by applicant or by job, newest first
+    __table_args__ = (
+        UniqueConstraint('job_id', 'applicant_id', name='unique_job_applicant'),
+        Index('idx_job_application_applicant_applied', 'applicant_id', 'applied_at'),
+        Index('idx_job_application_job_applied', 'job_id', 'applied_at'),
+    )
+    
+    @classmethod
+    def applied_job_ids(cls, user_id, job_ids):
+        """Return the subset of job_ids the user has applied to, in one query"""
+        if not job_ids:
+            return set()
+        rows = db.session.query(cls.job_id).filter(
+            cls.applicant_id == user_id,
+            cls.job_id.in_(job_ids)
+        ).all()
+        return {row[0] for row in rows}
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'status': self.status,
+            'cover_letter': self.cover_letter,
+            'resume_url': self.resume_url,
+            'applied_at': self.applied_at.isoformat() if self.applied_at else None,
+            'reviewed_at': self.reviewed_at.isoformat() if self.reviewed_at else None
+        }
 
+@event.listens_for(Job, 'before_insert')
+@event.listens_for(Job, 'before_update')
+def _set_location_key(mapper, connection, target):
+    target.location_key = normalize_location(target.location)
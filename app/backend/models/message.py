@@ -1,4 +1,5 @@
 from models import db
+from sqlalchemy import Index, case, desc, or_, literal_column
 from datetime import datetime
 
 class Conversation(db.Model):
@@ -9,14 +10,63 @@ class Conversation(db.Model):
     user2_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     last_message = db.Column(db.Text)
     last_message_time = db.Column(db.DateTime)
-    unread_count = db.Column(db.Integer, default=0)
+    user1_unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Unread by user1
+    user2_unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Unread by user2
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=literal_column('version') + 1)  # Row version for ETags, bumped by every UPDATE
     
     # Relationships
     messages = db.relationship('Message', backref='conversation', lazy=True)
     user1 = db.relationship('User', foreign_keys=[user1_id], backref='conversations_as_user1')
     user2 = db.relationship('User', foreign_keys=[user2_id], backref='conversations_as_user2')
+    
+    # Inbox lookups: each side of the conversation, newest thread first
+    __table_args__ = (
+        Index('idx_conversation_user1_last_message', 'user1_id', 'last_message_time'),
+        Index('idx_conversation_user2_last_message', 'user2_id', 'last_message_time'),
+    )
+    
+    @classmethod
+    def other_user_id(cls, user_id):
+        """SQL expression for the participant who is not user_id"""
+        return case((cls.user1_id == user_id, cls.user2_id), else_=cls.user1_id)
+    
+    @classmethod
+    def unread_column(cls, user_id):
+        """SQL expression for user_id's unread counter"""
+        return case((cls.user1_id == user_id, cls.user1_unread_count), else_=cls.user2_unread_count)
+    
+    def unread_count_for(self, user_id):
+        """Number of messages in this conversation user_id has not read"""
+        if self.user1_id == int(user_id):
+            return self.user1_unread_count or 0
+        return self.user2_unread_count or 0
+    
+    @classmethod
+    def query_inbox(cls, user_id):
+        """Query user_id's conversations, newest first, with the other participant.
+
+        Each row is (Conversation, other_user_id, other_username,
+        other_avatar_url, other_title); the other user's User and Profile
+        columns are joined in the same SELECT.
+        """
+        from .user import User
+        from .profile import Profile
+        return db.session.query(
+            cls,
+            User.id.label('other_user_id'),
+            User.username.label('other_username'),
+            Profile.avatar_url.label('other_avatar_url'),
+            Profile.title.label('other_title')
+        ).join(
+            User, User.id == cls.other_user_id(user_id)
+        ).join(
+            Profile, Profile.user_id == User.id
+        ).filter(
+            or_(cls.user1_id == user_id, cls.user2_id == user_id)
+        ).order_by(desc(cls.last_message_time), desc(cls.id))
 
 class Message(db.Model):
     __tablename__ = 'message'
@@ -30,4 +80,9 @@ class Message(db.Model):
     
     # Relationships
     sender = db.relationship('User', backref='sent_messages')
+    
+    # Thread history, read newest first in (created_at, id) order
+    __table_args__ = (
+        Index('idx_message_conversation_created_id', 'conversation_id', 'created_at', 'id'),
+    )
 
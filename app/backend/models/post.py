@@ -1,6 +1,8 @@
 from . import db
 from sqlalchemy.sql import func
-from sqlalchemy import Index
+from sqlalchemy import Index, UniqueConstraint, literal_column
+from sqlalchemy.orm import contains_eager
+import json
 
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,13 +11,17 @@ class Post(db.Model):
     media_url = db.Column(db.String(255), nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     category = db.Column(db.String(100), nullable=True, default='general')
-    tags = db.Column(db.Text, nullable=True)  # JSON string of tags
+    # JSON string of tags. active_history loads the old value on assignment, so the
+    # tag listeners in models/tag.py can diff it even when tags was not loaded yet
+    tags = db.column_property(db.Column(db.Text, nullable=True), active_history=True)
     visibility = db.Column(db.String(20), nullable=False, default='public')  # public, private, connections
     likes_count = db.Column(db.Integer, default=0)
     views_count = db.Column(db.Integer, default=0)
     comments_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
     updated_at = db.Column(db.DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1',
+                        onupdate=literal_column('version') + 1)  # Row version for ETags, bumped by every UPDATE
 
     user = db.relationship('User', backref=db.backref('posts', lazy=True))
 
@@ -29,15 +35,28 @@ class Post(db.Model):
         Index('idx_post_user_id', 'user_id'),
     )
 
+    @classmethod
+    def query_with_author(cls):
+        """Query posts together with their author's User and Profile columns.
+
+        The author rows are joined into the same SELECT and populated through
+        contains_eager, so serializing a page never lazy-loads post.user or
+        post.user.profile one post at a time.
+        """
+        from .user import User
+        return cls.query.join(cls.user).outerjoin(User.profile).options(
+            contains_eager(cls.user).contains_eager(User.profile)
+        )
+
+    def tags_list(self):
+        if not self.tags:
+            return []
+        try:
+            return json.loads(self.tags)
+        except (TypeError, ValueError):
+            return []
+
     def to_dict(self):
-        import json
-        tags_list = []
-        if self.tags:
-            try:
-                tags_list = json.loads(self.tags)
-            except:
-                tags_list = []
-        
         return {
             'id': self.id,
             'title': self.title,
@@ -45,7 +64,7 @@ class Post(db.Model):
             'media_url': self.media_url,
             'user_id': self.user_id,
             'category': self.category,
-            'tags': tags_list,
+            'tags': self.tags_list(),
             'visibility': self.visibility,
             'likes_count': self.likes_count,
             'views_count': self.views_count,
@@ -54,3 +73,53 @@ class Post(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'user': self.user.username if self.user else None
         }
+
+    def to_feed_dict(self, liked=False):
+        """Serialize for the feed; expects a post loaded via query_with_author()"""
+        profile = self.user.profile if self.user else None
+        return {
+            'id': self.id,
+            'title': self.title,
+            'content': self.content,
+            'media_url': self.media_url,
+            'category': self.category,
+            'visibility': self.visibility,
+            'tags': self.tags_list(),
+            'likes_count': self.likes_count,
+            'comments_count': self.comments_count,
+            'liked': liked,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'author': {
+                'id': self.user.id if self.user else self.user_id,
+                'name': self.user.username if self.user else None,
+                'avatar_url': profile.avatar_url if profile else None,
+                'title': profile.title if profile else None
+            }
+        }
+
+
+class PostLike(db.Model):
+    __tablename__ = 'post_like'
+
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), server_default=func.now())
+
+    # One like per user and post; the unique key makes like/unlike idempotent
+    __table_args__ = (
+        UniqueConstraint('post_id', 'user_id', name='uq_post_like_post_user'),
+        Index('idx_post_like_user_post', 'user_id', 'post_id'),
+    )
+
+    @classmethod
+    def liked_post_ids(cls, user_id, post_ids):
+        """Return the subset of post_ids the user has liked, in one query"""
+        if not post_ids:
+            return set()
+        rows = db.session.query(cls.post_id).filter(
+            cls.user_id == user_id,
+            cls.post_id.in_(post_ids)
+        ).all()
+        return {row[0] for row in rows}
@@ -1,4 +1,5 @@
 from models import db
+from sqlalchemy.orm import joinedload, selectinload
 
 class Profile(db.Model):
     __tablename__ = 'profiles'
@@ -12,8 +13,76 @@ class Profile(db.Model):
     connections = db.Column(db.Integer, default=0)  # New field
     mutualConnections = db.Column(db.Integer, default=0)  # New field
     avatar_url = db.Column(db.String(256))  # Store avatar image path
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped on every profile change
     # Add more fields as needed
 
+    skills = db.relationship('Skill', lazy=True, order_by='Skill.id')
+    experiences = db.relationship('Experience', lazy=True, order_by='Experience.id')
+    educations = db.relationship('Education', lazy=True, order_by='Education.id')
+    activities = db.relationship('Activity', lazy=True, order_by='Activity.id.desc()')
+
+    @classmethod
+    def query_aggregate(cls):
+        """Query profiles with their user and every child collection preloaded.
+
+        The user is joined into the profile SELECT and each collection is
+        fetched with one selectin query, so loading a full profile takes the
+        same number of round trips however many rows it has.
+        """
+        return cls.query.options(
+            joinedload(cls.user),
+            selectinload(cls.skills),
+            selectinload(cls.experiences),
+            selectinload(cls.educations),
+            selectinload(cls.activities)
+        )
+
+    def to_dict(self):
+        """Serialize the full profile; expects a profile loaded via query_aggregate()"""
+        user = self.user
+        return {
+            'id': user.id,
+            'name': user.username,
+            'email': user.email,
+            'title': self.title,
+            'bio': self.bio,
+            'location': self.location,
+            'skills': [s.name for s in self.skills],
+            # Languages are stored comma-separated in profile.languages
+            'languages': (self.languages or '').split(','),
+            'experience': [
+                {
+                    'company': e.company,
+                    'title': e.title,
+                    'start': str(e.start_date) if e.start_date else '',
+                    'end': str(e.end_date) if e.end_date else '',
+                }
+                for e in self.experiences
+            ],
+            'education': [
+                {
+                    'school': ed.school,
+                    'degree': ed.degree,
+                    'start': str(ed.start_year) if ed.start_year else '',
+                    'end': str(ed.end_year) if ed.end_year else '',
+                }
+                for ed in self.educations
+            ],
+            'contact': {'email': user.email, 'phone': self.phone},
+            'activity': [
+                {
+                    'type': a.type,
+                    'content': a.content,
+                    'date': a.date,
+                }
+                for a in self.activities
+            ],
+            'connections': self.connections,
+            'mutualConnections': self.mutualConnections,
+            'avatarUrl': self.avatar_url or '',
+            'socialLinks': [],
+        }
+
 class Skill(db.Model):
     __tablename__ = 'skills'
     id = db.Column(db.Integer, primary_key=True)
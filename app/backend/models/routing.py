@@ -0,0 +1,83 @@
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+class RoutingSession(Session):
+    """Session that sends reads from read-only requests to the replica bind.
+
+    Statements run while handling a GET/HEAD request of one of the
+    DB_REPLICA_BLUEPRINTS go to the 'replica' engine when one is configured
+    (SQLALCHEMY_BINDS['replica']). Flushes, INSERT/UPDATE/DELETE statements
+    and everything outside a request (background threads, scripts) stay on
+    the primary.
+
+    A user who committed a write is pinned to the primary for
+    DB_REPLICA_PIN_SECONDS so they read their own writes despite replication
+    lag. The pin lives in the app cache; use a shared CACHE_BACKEND when
+    requests of one user can reach several workers.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if self._flushing or isinstance(clause, UpdateBase):
+            return False
+        if not has_request_context() or request.method not in READ_METHODS:
+            return False
+        if request.blueprint not in current_app.config.get('DB_REPLICA_BLUEPRINTS', ()):
+            return False
+        return 'replica' in self._db.engines and not pinned_to_primary()
+
+
+def request_user_id():
+    """JWT identity of the current request, or None if it has none"""
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        # No JWT was verified for this request
+        return None
+
+def pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+def pinned_to_primary():
+    """Whether the request's user wrote recently; looked up once per request"""
+    if 'db_primary_pinned' not in g:
+        user_id = request_user_id()
+        cache = current_app.extensions.get('cache')
+        g.db_primary_pinned = bool(user_id and cache and cache.get(pin_key(user_id)))
+    return g.db_primary_pinned
+
+
+# Read-after-write: note sessions that wrote (ORM flushes and DML run through
+# session.execute), and pin the request's user once the write commits
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info['db_wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['db_wrote'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _pin_writer(session):
+    if not session.info.pop('db_wrote', False) or not has_request_context():
+        return
+    user_id = request_user_id()
+    cache = current_app.extensions.get('cache')
+    if user_id and cache and 'replica' in session._db.engines:
+        cache.set(pin_key(user_id), True, current_app.config.get('DB_REPLICA_PIN_SECONDS', 5))
+        g.db_primary_pinned = True
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _forget_writes(session, previous_transaction):
+    session.info.pop('db_wrote', None)
@@ -0,0 +1,114 @@
+from . import db
+from .post import Post
+from sqlalchemy import Index, event, inspect
+import json
+
+MAX_TAG_LENGTH = 64
+
+class TagStat(db.Model):
+    """Number of posts carrying each tag, kept up to date on post writes"""
+    __tablename__ = 'tag_stats'
+
+    tag = db.Column(db.String(MAX_TAG_LENGTH), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('idx_tag_stats_count', 'count'),
+    )
+
+class PostTag(db.Model):
+    """Normalized post <-> tag association, indexed by tag for filtering"""
+    __tablename__ = 'post_tag'
+
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True)
+    tag = db.Column(db.String(MAX_TAG_LENGTH), primary_key=True)
+
+    __table_args__ = (
+        Index('idx_post_tag_tag_post', 'tag', 'post_id'),
+    )
+
+def normalize_tags(tags):
+    """Turn a JSON string or list of tags into a de-duplicated list of clean tag names"""
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except ValueError:
+            return []
+    if not isinstance(tags, list):
+        return []
+
+    normalized = []
+    for tag in tags:
+        if not isinstance(tag, str):
+            continue
+        tag = tag.strip().lower()[:MAX_TAG_LENGTH]
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+def _increment_tags(connection, tags):
+    table = TagStat.__table__
+    rows = [{'tag': tag, 'count': 1} for tag in tags]
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(count=table.c.count + 1)
+        connection.execute(stmt)
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.tag], set_={'count': table.c.count + 1})
+        connection.execute(stmt)
+    else:
+        for tag in tags:
+            result = connection.execute(
+                table.update().where(table.c.tag == tag).values(count=table.c.count + 1)
+            )
+            if not result.rowcount:
+                connection.execute(table.insert().values(tag=tag, count=1))
+
+def _decrement_tags(connection, tags):
+    table = TagStat.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.tag.in_(tags), table.c.count > 0)
+        .values(count=table.c.count - 1)
+    )
+
+def apply_tag_change(connection, post_id, old_tags, new_tags):
+    """Sync post_tag rows and tag counters for a post whose tags went from old_tags to new_tags"""
+    old_tags = set(normalize_tags(old_tags))
+    new_tags = set(normalize_tags(new_tags))
+    added = sorted(new_tags - old_tags)
+    removed = sorted(old_tags - new_tags)
+    post_tag = PostTag.__table__
+    if added:
+        connection.execute(post_tag.insert(), [{'post_id': post_id, 'tag': tag} for tag in added])
+        _increment_tags(connection, added)
+    if removed:
+        connection.execute(
+            post_tag.delete().where(post_tag.c.post_id == post_id, post_tag.c.tag.in_(removed))
+        )
+        _decrement_tags(connection, removed)
+
+# Keep post_tag and tag_stats in step with post writes. The listeners run inside the same
+# flush (and transaction) as the post INSERT/UPDATE/DELETE.
+@event.listens_for(Post, 'after_insert')
+def _post_inserted(mapper, connection, target):
+    apply_tag_change(connection, target.id, None, target.tags)
+
+@event.listens_for(Post, 'after_update')
+def _post_updated(mapper, connection, target):
+    history = inspect(target).attrs.tags.history
+    if not history.has_changes():
+        return
+    old_tags = history.deleted[0] if history.deleted else None
+    apply_tag_change(connection, target.id, old_tags, target.tags)
+
+@event.listens_for(Post, 'after_delete')
+def _post_deleted(mapper, connection, target):
+    apply_tag_change(connection, target.id, target.tags, None)
@@ -1,6 +1,13 @@
+from flask import current_app
 from models import db
 from werkzeug.security import generate_password_hash, check_password_hash
 
+DEFAULT_PASSWORD_HASH_METHOD = 'pbkdf2:sha256:600000'
+
+def password_hash_method():
+    """The werkzeug hash method new password hashes should use"""
+    return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+
 class User(db.Model):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
@@ -10,11 +17,15 @@ class User(db.Model):
     profile = db.relationship('Profile', backref='user', uselist=False)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=password_hash_method())
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def needs_rehash(self):
+        """True when the stored hash was made with other parameters than the configured ones"""
+        return self.password_hash.split('$', 1)[0] != password_hash_method()
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,48 @@
+from .pagination import encode_cursor, decode_cursor, keyset_paginate
+from .view_counter import ViewCounter, view_counter
+from .search import PostSearch, post_search
+from .cache import Cache, MemoryBackend, SQLiteBackend, cache
+from .image_pipeline import ImagePipeline, PipelineBusy, image_pipeline
+from .uploads import StreamingUpload, UploadTooLarge, UploadRejected, parse_streaming_form
+from .collection_sync import sync_collection
+from .http_cache import compute_etag, not_modified, with_etag, etag_cached, register_cache_control
+from .realtime import Broker, LocalBroker, MessageHub, TooManyStreams, message_hub
+from .password_hasher import PasswordHasher, HashingBusy, password_hasher
+from .current_user import CurrentUserLoader, current_user_loader
+
+__all__ = [
+    'encode_cursor',
+    'decode_cursor',
+    'keyset_paginate',
+    'ViewCounter',
+    'view_counter',
+    'PostSearch',
+    'post_search',
+    'Cache',
+    'MemoryBackend',
+    'SQLiteBackend',
+    'cache',
+    'ImagePipeline',
+    'PipelineBusy',
+    'image_pipeline',
+    'StreamingUpload',
+    'UploadTooLarge',
+    'UploadRejected',
+    'parse_streaming_form',
+    'sync_collection',
+    'compute_etag',
+    'not_modified',
+    'with_etag',
+    'etag_cached',
+    'register_cache_control',
+    'Broker',
+    'LocalBroker',
+    'MessageHub',
+    'TooManyStreams',
+    'message_hub',
+    'PasswordHasher',
+    'HashingBusy',
+    'password_hasher',
+    'CurrentUserLoader',
+    'current_user_loader'
+]
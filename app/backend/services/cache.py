@@ -0,0 +1,189 @@
+import functools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+MISSING = object()
+
+
+class MemoryBackend:
+    """Per-process LRU store with expiry times"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """Store shared by every worker on the host through one SQLite file.
+
+    Values are kept as JSON, so only JSON-serializable data can be cached.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'prok_cache.sqlite3')
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, expires_at FROM cache_entry WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return MISSING
+        if row[1] <= time.time():
+            self.delete(key)
+            return MISSING
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), time.time() + ttl)
+        )
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM cache_entry WHERE key = ?', (key,))
+
+    def delete_prefix(self, prefix):
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        self._connect().execute(
+            "DELETE FROM cache_entry WHERE key LIKE ? ESCAPE '\\'", (escaped + '%',)
+        )
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache_entry')
+
+
+class Cache:
+    """TTL cache with event-based invalidation.
+
+    Functions decorated with cached() declare the write events that make
+    their result stale. Model listeners report those events with
+    invalidate_after_commit(); the matching keys are dropped once the
+    transaction commits, and never on rollback.
+    """
+
+    def __init__(self, backend=None, default_ttl=300):
+        self.backend = backend or MemoryBackend()
+        self.default_ttl = default_ttl
+        self._subscriptions = {}  # event -> set of key prefixes
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        if backend == 'sqlite':
+            self.backend = SQLiteBackend(app.config.get('CACHE_SQLITE_PATH'))
+        elif backend == 'memory':
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND: {backend}')
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', self.default_ttl)
+        app.extensions['cache'] = self
+
+    def get(self, key, default=None):
+        value = self.backend.get(key)
+        return default if value is MISSING else value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, self.default_ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def cached(self, key, ttl=None, invalidate_on=()):
+        """Cache a function's result under key (plus its arguments) for ttl seconds"""
+        for event_name in invalidate_on:
+            self._subscriptions.setdefault(event_name, set()).add(key)
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                full_key = ':'.join([key] + [str(arg) for arg in args] +
+                                    [f'{name}={value}' for name, value in sorted(kwargs.items())])
+                value = self.backend.get(full_key)
+                if value is MISSING:
+                    value = func(*args, **kwargs)
+                    self.set(full_key, value, ttl)
+                return value
+
+            wrapper.cache_key = key
+            return wrapper
+        return decorator
+
+    def invalidate(self, *event_names):
+        """Drop every cached key subscribed to the given events right away"""
+        for event_name in event_names:
+            for key in self._subscriptions.get(event_name, ()):
+                self.backend.delete_prefix(key)
+
+    def invalidate_after_commit(self, session, *event_names):
+        """Queue events on a session; they fire when it commits"""
+        session.info.setdefault('cache_events', set()).update(event_names)
+
+
+cache = Cache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _fire_cache_events(session):
+    event_names = session.info.pop('cache_events', None)
+    if event_names:
+        cache.invalidate(*event_names)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_cache_events(session, previous_transaction):
+    session.info.pop('cache_events', None)
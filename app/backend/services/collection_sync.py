@@ -0,0 +1,41 @@
+from sqlalchemy import insert, update, delete
+from models import db
+
+
+def sync_collection(model, existing, incoming, fields, newest_first=False, **parent):
+    """Make a child table match `incoming`, in order, with the fewest row writes.
+
+    existing is the list of rows currently stored, incoming a list of dicts
+    holding `fields`, and parent the foreign key values for new rows (for
+    example profile_id=3). Collections are displayed in id order (newest
+    first when newest_first is set), so entries are matched to stored rows
+    by position in that order: rows whose position already holds the same
+    values are left untouched, the others are updated in place, and any
+    surplus is inserted (new ids sort last) or deleted. Each kind of write
+    goes out as one executemany statement, so an unchanged collection costs
+    no writes at all, and a reordered one keeps its new order.
+
+    Returns a (inserted, updated, deleted) tuple of row counts.
+    """
+    rows = sorted(existing, key=lambda row: row.id)
+    entries = list(reversed(incoming)) if newest_first else list(incoming)
+
+    updates = []
+    for row, values in zip(rows, entries):
+        if any(getattr(row, field) != values.get(field) for field in fields):
+            updates.append(dict({field: values.get(field) for field in fields}, id=row.id))
+    inserts = [
+        dict({field: values.get(field) for field in fields}, **parent)
+        for values in entries[len(rows):]
+    ]
+    delete_ids = [row.id for row in rows[len(entries):]]
+
+    if updates:
+        # ORM bulk UPDATE by primary key (SQLAlchemy 2.0, see requirements.txt)
+        db.session.execute(update(model), updates)
+    if inserts:
+        # render_nulls keeps rows with NULL values in the same executemany batch
+        db.session.execute(insert(model).execution_options(render_nulls=True), inserts)
+    if delete_ids:
+        db.session.execute(delete(model).where(model.id.in_(delete_ids)))
+    return len(inserts), len(updates), len(delete_ids)
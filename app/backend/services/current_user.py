@@ -0,0 +1,99 @@
+from flask import g
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from models import db
+from models.user import User
+from models.profile import Profile
+from .cache import MemoryBackend, MISSING
+
+
+class CurrentUserLoader:
+    """Loads the JWT identity's User and Profile once per request.
+
+    Within a request the instances are kept on flask.g. Across requests their
+    column values are kept in a small per-process LRU with a TTL, and rebuilt
+    into session-attached instances without a query (merge with load=False).
+    Entries are dropped when a User or Profile write commits in this
+    process; other workers may serve a stale copy until the TTL expires, so
+    handlers that write should load with refresh=True.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        self.backend = MemoryBackend(1024)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CURRENT_USER_CACHE_TTL', self.ttl)
+        self.backend = MemoryBackend(app.config.get('CURRENT_USER_CACHE_SIZE', 1024))
+        app.extensions['current_user_loader'] = self
+
+    def user(self, refresh=False):
+        """The current user, or None if the identity no longer exists"""
+        return self._load('user', User, User.id, refresh)
+
+    def profile(self, refresh=False):
+        """The current user's profile, or None if there is none"""
+        return self._load('profile', Profile, Profile.user_id, refresh)
+
+    def invalidate(self, user_id):
+        self.backend.delete(f'user:{user_id}')
+        self.backend.delete(f'profile:{user_id}')
+
+    def _load(self, name, model, key_column, refresh):
+        user_id = int(get_jwt_identity())
+        attribute = f'current_{name}'
+        if not refresh and attribute in g:
+            return getattr(g, attribute)
+
+        key = f'{name}:{user_id}'
+        values = MISSING if refresh else self.backend.get(key)
+        if values is MISSING:
+            instance = model.query.filter(key_column == user_id).first()
+            self.backend.set(key, snapshot(instance) if instance else None, self.ttl)
+        else:
+            instance = restore(model, values) if values is not None else None
+
+        setattr(g, attribute, instance)
+        return instance
+
+
+def snapshot(instance):
+    """Column values of an instance, enough to rebuild it with restore()"""
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(type(instance)).column_attrs}
+
+def restore(model, values):
+    """Rebuild a persistent instance in db.session from snapshot() values without a query"""
+    instance = inspect(model).class_manager.new_instance()
+    for key, value in values.items():
+        setattr(instance, key, value)
+    make_transient_to_detached(instance)
+    return db.session.merge(instance, load=False)
+
+
+current_user_loader = CurrentUserLoader()
+
+
+# Invalidation: queue the user ids whose User or Profile rows were written,
+# and drop their entries once the transaction commits
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_written(mapper, connection, target):
+    inspect(target).session.info.setdefault('current_user_writes', set()).add(target.id)
+
+@event.listens_for(Profile, 'after_insert')
+@event.listens_for(Profile, 'after_update')
+@event.listens_for(Profile, 'after_delete')
+def _profile_written(mapper, connection, target):
+    inspect(target).session.info.setdefault('current_user_writes', set()).add(target.user_id)
+
+@event.listens_for(Session, 'after_commit')
+def _drop_written_users(session):
+    for user_id in session.info.pop('current_user_writes', ()):
+        current_user_loader.invalidate(user_id)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_written_users(session, previous_transaction):
+    session.info.pop('current_user_writes', None)
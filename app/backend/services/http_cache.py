@@ -0,0 +1,60 @@
+import functools
+import hashlib
+from flask import current_app, make_response, request
+
+
+def compute_etag(*parts):
+    """Build an ETag from version stamps, scoped to the request URL.
+
+    parts should be cheap values that change whenever the response would
+    (row ids, updated_at maxima, version counters, the caller's user id),
+    so a validator can be produced without rendering the response body.
+    """
+    key = repr((request.path, sorted(request.args.items(multi=True)), parts))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def not_modified(etag):
+    """Return a 304 response if the client already holds etag, else None"""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def with_etag(response, etag):
+    response = make_response(response)
+    if response.status_code == 200:
+        response.set_etag(etag)
+    return response
+
+
+def etag_cached(version_fn):
+    """Answer conditional GETs from version_fn(*view_args) without running the view.
+
+    version_fn returns the stamp for the resource, or None when it cannot
+    tell (for example the row does not exist), in which case the view runs
+    as usual and the response carries no ETag.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            stamp = version_fn(*args, **kwargs)
+            if stamp is None:
+                return view(*args, **kwargs)
+            etag = compute_etag(stamp)
+            return not_modified(etag) or with_etag(view(*args, **kwargs), etag)
+        return wrapper
+    return decorator
+
+
+def register_cache_control(blueprint):
+    """Add the Cache-Control header configured for this blueprint to its GET responses"""
+    @blueprint.after_request
+    def set_cache_control(response):
+        value = current_app.config.get('HTTP_CACHE_CONTROL', {}).get(blueprint.name)
+        if value and request.method == 'GET' and 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = value
+        return response
+    return blueprint
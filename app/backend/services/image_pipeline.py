@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from sqlalchemy import update
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# (name, filename pattern, box size, format, save options) for every avatar rendition
+RENDITIONS = [
+    ('avatar', '{basename}.jpg', (400, 400), 'JPEG', {'quality': 85, 'optimize': True}),
+    ('thumb', 'thumb_{basename}.jpg', (100, 100), 'JPEG', {'quality': 70, 'optimize': True}),
+    ('webp', '{basename}.webp', (400, 400), 'WEBP', {'quality': 80, 'method': 4}),
+]
+
+
+def rendition_url(name, basename):
+    """Public URL a rendition of basename is served from once it is rendered"""
+    pattern = next(pattern for rendition, pattern, *_ in RENDITIONS if rendition == name)
+    return f"/static/uploads/{pattern.format(basename=basename)}"
+
+def discard_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PipelineBusy(Exception):
+    """Raised when the processing queue is full"""
+
+
+class ImagePipeline:
+    """Background avatar processing.
+
+    The request handler only stores the raw upload and calls submit(); decoding,
+    resizing and encoding the renditions happen on a small thread pool. When a
+    job finishes, the profile's avatar_url is switched to the new image with a
+    single UPDATE, after every rendition file is already in place.
+
+    Job status is held in process memory, so it is only visible to the worker
+    that accepted the upload; the profile itself is the source of truth.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.max_queue = 32
+        self._executor = None
+        self._jobs = OrderedDict()  # job_id -> status dict
+        self._latest = {}  # profile_id -> most recently submitted job_id
+        self._queued = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_queue = app.config.get('IMAGE_PIPELINE_MAX_QUEUE', self.max_queue)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config.get('IMAGE_PIPELINE_WORKERS', 2),
+            thread_name_prefix='image-pipeline'
+        )
+        app.extensions['image_pipeline'] = self
+
+    def submit(self, profile_id, user_id, raw_path, output_dir, basename):
+        """Queue processing of raw_path; returns the job id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._queued >= self.max_queue:
+                raise PipelineBusy()
+            self._queued += 1
+            self._jobs[job_id] = {'status': 'pending', 'user_id': user_id, 'imageUrl': None}
+            # Forget the oldest finished jobs so the table stays small
+            while len(self._jobs) > 1000:
+                self._jobs.popitem(last=False)
+            self._latest[profile_id] = job_id
+        self._executor.submit(self._process, job_id, profile_id, user_id, raw_path, output_dir, basename)
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _set_status(self, job_id, **values):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(values)
+
+    def _process(self, job_id, profile_id, user_id, raw_path, output_dir, basename):
+        try:
+            urls = self.render(raw_path, output_dir, basename)
+            with self._lock:
+                is_latest = self._latest.get(profile_id) == job_id
+            # A newer upload for the same profile wins, even if it finished first
+            if is_latest:
+                self._swap_avatar(profile_id, user_id, urls['avatar'])
+            self._set_status(job_id, status='done', imageUrl=urls['avatar'], renditions=urls)
+        except Exception:
+            logger.exception('Avatar processing failed for profile %s', profile_id)
+            self._set_status(job_id, status='failed')
+        finally:
+            # The original keeps EXIF/GPS metadata; only the renditions are kept
+            discard_file(raw_path)
+            with self._lock:
+                self._queued -= 1
+                if self._latest.get(profile_id) == job_id:
+                    del self._latest[profile_id]
+
+    def render(self, raw_path, output_dir, basename):
+        """Write every rendition of raw_path and return their URLs keyed by name"""
+        urls = {}
+        with Image.open(raw_path) as source:
+            source = source.convert('RGB')
+            for name, pattern, size, image_format, options in RENDITIONS:
+                image = source.copy()
+                image.thumbnail(size)
+                filename = pattern.format(basename=basename)
+                # Write to a temporary name and rename, so a half-written
+                # file is never served under the final name
+                final_path = os.path.join(output_dir, filename)
+                tmp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+                image.save(tmp_path, format=image_format, **options)
+                os.replace(tmp_path, final_path)
+                urls[name] = rendition_url(name, basename)
+        return urls
+
+    def _swap_avatar(self, profile_id, user_id, avatar_url):
+        from models.profile import Profile
+        from services.current_user import current_user_loader
+        with self.app.app_context():
+            try:
+                db.session.execute(
+                    update(Profile).where(Profile.id == profile_id).values(
+                        avatar_url=avatar_url,
+                        version=Profile.version + 1
+                    )
+                )
+                db.session.commit()
+                # A bulk UPDATE fires no mapper events; drop the cached profile here
+                current_user_loader.invalidate(user_id)
+            finally:
+                db.session.remove()
+
+
+image_pipeline = ImagePipeline()
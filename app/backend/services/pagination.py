@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_, desc, func, select
+from sqlalchemy.orm import aliased
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque, URL-safe cursor"""
+    payload = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def stored_created_at(created_column, id_column, row_id, created_at):
+    """The cursor row's created_at exactly as the database stores it.
+
+    A bound datetime is not always stored the same way as the column: SQLite
+    keeps server-default timestamps as 'YYYY-MM-DD HH:MM:SS' text but binds
+    '...HH:MM:SS.000000', which sorts after it. Reading the value back from
+    the cursor row keeps the comparison exact on every dialect; the decoded
+    value is only used if that row has been deleted since.
+    """
+    row = aliased(created_column.class_)
+    stored = select(getattr(row, created_column.key)).where(
+        getattr(row, id_column.key) == row_id
+    ).scalar_subquery()
+    return func.coalesce(stored, created_at)
+
+
+def keyset_paginate(query, created_column, id_column, per_page, cursor=None):
+    """Return one page of rows ordered by (created_at, id) descending.
+
+    Instead of OFFSET + COUNT(*), rows are located by seeking past the last
+    (created_at, id) pair the client has seen, so every page costs a single
+    index range scan no matter how deep the client has scrolled.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        boundary = stored_created_at(created_column, id_column, row_id, created_at)
+        query = query.filter(or_(
+            created_column < boundary,
+            and_(created_column == boundary, id_column < row_id)
+        ))
+
+    # Fetch one extra row to find out whether another page exists
+    rows = query.order_by(desc(created_column), desc(id_column)).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = None
+    if has_next and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+
+    return rows, next_cursor
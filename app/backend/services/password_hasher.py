@@ -0,0 +1,133 @@
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full or a hash took too long"""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+def _verify(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """Runs password hashing and verification on a bounded process pool.
+
+    PBKDF2/scrypt are CPU-bound and hold the GIL in the request worker, so a
+    burst of logins would starve every other request served by the same
+    process. Here the handler thread only waits on a future while the work
+    runs in a separate process. At most workers + max_queue calls are in
+    flight; beyond that HashingBusy is raised so the handler can answer 503.
+
+    With PASSWORD_HASH_WORKERS = 0 hashing runs inline (scripts, tests).
+    """
+
+    def __init__(self, app=None):
+        self.workers = 2
+        self.max_queue = 64
+        self.timeout = 10.0
+        self._executor = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._latencies = deque(maxlen=1000)  # seconds, most recent calls
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.max_queue = app.config.get('PASSWORD_HASH_MAX_QUEUE', self.max_queue)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password, method):
+        """Hash password with the given werkzeug method"""
+        return self._run(_hash, password, method)
+
+    def verify(self, password_hash, password):
+        """Check password against a stored werkzeug hash"""
+        return self._run(_verify, password_hash, password)
+
+    def _run(self, function, *args):
+        started = time.monotonic()
+        if self.workers <= 0:
+            result = function(*args)
+            self._record(started)
+            return result
+
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise HashingBusy()
+            self._in_flight += 1
+            # Created on first use with spawned workers: forking from a
+            # request thread would copy the app's locks, sockets and threads
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+
+        try:
+            future = self._executor.submit(function, *args)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(lambda done: self._finished(started))
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            logger.warning('Password hashing timed out after %.1fs', self.timeout)
+            raise HashingBusy()
+
+    def _finished(self, started):
+        with self._lock:
+            self._in_flight -= 1
+        self._record(started)
+
+    def _record(self, started):
+        with self._lock:
+            self._completed += 1
+            self._latencies.append(time.monotonic() - started)
+
+    def metrics(self):
+        """Queue depth, counters and latency of recent calls (milliseconds)"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight = self._in_flight
+            completed, rejected = self._completed, self._rejected
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 1)
+
+        return {
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'in_flight': in_flight,
+            'queue_depth': max(0, in_flight - self.workers),
+            'completed': completed,
+            'rejected': rejected,
+            'latency_ms': {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': round(latencies[-1] * 1000, 1) if latencies else None
+            }
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,164 @@
+import json
+import logging
+import queue
+import threading
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.utils import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Broker:
+    """Carries published events to every worker process.
+
+    publish() hands an event to the transport; the broker calls the deliver
+    callback given to start() once for each event that reaches this worker,
+    including the ones it published itself. A multi-worker deployment plugs
+    in a broker backed by shared infrastructure (Redis pub/sub, Postgres
+    LISTEN/NOTIFY, ...) through the MESSAGE_BROKER dotted path.
+    """
+
+    def start(self, deliver):
+        raise NotImplementedError
+
+    def publish(self, user_id, message):
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    """In-process broker: events only reach streams held by this worker"""
+
+    def __init__(self, app=None):
+        self._deliver = None
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, user_id, message):
+        if self._deliver is not None:
+            self._deliver(user_id, message)
+
+
+BROKERS = {
+    'local': LocalBroker
+}
+
+
+class TooManyStreams(Exception):
+    """Raised when a user already holds the maximum number of open streams"""
+
+
+class MessageHub:
+    """Per-user pub/sub for server-sent events.
+
+    Each open stream registers a bounded queue under its user id. publish()
+    goes through the broker, and deliveries fan out to the local queues of
+    that user. A stream whose queue is full misses the event rather than
+    blocking the sender; clients resync with a normal GET after reconnecting.
+
+    EventSource cannot send an Authorization header, so clients trade their
+    access token for a short-lived signed stream ticket and pass that in the
+    query string instead.
+    """
+
+    def __init__(self, broker=None):
+        self.broker = broker or LocalBroker()
+        self.keepalive = 15.0
+        self.queue_size = 100
+        self.max_per_user = 3
+        self.ticket_ttl = 30
+        self._tickets = None
+        self._subscribers = {}  # user id -> set of queues
+        self._lock = threading.Lock()
+        self.broker.start(self._deliver)
+
+    def init_app(self, app):
+        broker = app.config.get('MESSAGE_BROKER', 'local')
+        broker_class = BROKERS.get(broker) or import_string(broker)
+        self.broker = broker_class(app)
+        self.broker.start(self._deliver)
+        self.keepalive = app.config.get('MESSAGE_STREAM_KEEPALIVE', self.keepalive)
+        self.queue_size = app.config.get('MESSAGE_STREAM_QUEUE_SIZE', self.queue_size)
+        self.max_per_user = app.config.get('MESSAGE_STREAM_MAX_PER_USER', self.max_per_user)
+        self.ticket_ttl = app.config.get('MESSAGE_STREAM_TICKET_TTL', self.ticket_ttl)
+        self._tickets = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='message-stream')
+        app.extensions['message_hub'] = self
+
+    def issue_ticket(self, user_id):
+        """Signed ticket that opens a stream for user_id within ticket_ttl seconds"""
+        return self._tickets.dumps(str(user_id))
+
+    def redeem_ticket(self, ticket):
+        """User id of a valid, unexpired ticket, otherwise None"""
+        try:
+            return self._tickets.loads(ticket, max_age=self.ticket_ttl)
+        except BadSignature:
+            return None
+
+    def subscribe(self, user_id):
+        """Register a stream queue for user_id; raises TooManyStreams at the limit"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            subscribers = self._subscribers.setdefault(str(user_id), set())
+            if self.max_per_user and len(subscribers) >= self.max_per_user:
+                raise TooManyStreams()
+            subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(str(user_id))
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[str(user_id)]
+
+    def publish(self, user_ids, event_name, data):
+        """Send an event to every open stream of the given users"""
+        message = {'event': event_name, 'data': data}
+        for user_id in set(str(user_id) for user_id in user_ids):
+            self.broker.publish(user_id, message)
+
+    def publish_after_commit(self, session, user_ids, event_name, data):
+        """Queue an event on a session; it is published when the session commits"""
+        session.info.setdefault('hub_events', []).append((user_ids, event_name, data))
+
+    def _deliver(self, user_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(user_id), ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                logger.warning('Dropping %s event for a slow stream of user %s', message['event'], user_id)
+
+    def stream(self, subscriber):
+        """Generator of server-sent event frames for a subscribed queue.
+
+        The caller unsubscribes when the response closes; a generator that is
+        never started would not run a finally block.
+        """
+        # Comment frame so proxies and the client see the stream open
+        yield ': connected\n\n'
+        while True:
+            try:
+                message = subscriber.get(timeout=self.keepalive)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            yield f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+message_hub = MessageHub()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_hub_events(session):
+    for user_ids, event_name, data in session.info.pop('hub_events', ()):
+        message_hub.publish(user_ids, event_name, data)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_hub_events(session, previous_transaction):
+    session.info.pop('hub_events', None)
@@ -0,0 +1,262 @@
+import logging
+import math
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import event, inspect, text, case, Integer, Float
+from sqlalchemy.orm import Session, object_session
+from models import db
+from models.post import Post
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def tokenize(value):
+    """Lower-cased word tokens of a post field, with HTML tags stripped"""
+    return TOKEN_RE.findall(TAG_RE.sub(' ', value or '').lower())
+
+
+class SearchBackend:
+    """Interface for post search backends.
+
+    apply() narrows a Post query to the posts matching the search text and
+    returns it together with a relevance expression (higher is better) that
+    callers can order by. index_post()/remove_post() are called from the
+    Post write listeners so backends that keep their own index stay in sync:
+    transactional backends get the connection of the flush that changed the
+    post, the others are only called once that transaction has committed
+    (with connection=None).
+    """
+    name = None
+    transactional = True
+
+    def setup(self, engine):
+        """One-time preparation at startup, on the primary engine"""
+        pass
+
+    def apply(self, query, search_text):
+        raise NotImplementedError
+
+    def index_post(self, connection, post_id, title, content):
+        pass
+
+    def remove_post(self, connection, post_id):
+        pass
+
+
+class MySQLFulltextBackend(SearchBackend):
+    """MATCH ... AGAINST over the ft_post_title_content FULLTEXT index"""
+    name = 'mysql'
+
+    def apply(self, query, search_text):
+        # InnoDB maintains the FULLTEXT index itself, so there is nothing to sync
+        from sqlalchemy.dialects.mysql import match
+        relevance = match(Post.title, Post.content, against=search_text).in_natural_language_mode()
+        return query.filter(relevance > 0), relevance
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """SQLite FTS5 virtual table ranked with bm25(), for local and test use"""
+    name = 'sqlite'
+
+    def setup(self, engine):
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(title, content)'
+            )
+            # First start against an existing database: index the posts already there
+            indexed = connection.exec_driver_sql('SELECT count(*) FROM post_fts').scalar()
+            if not indexed and inspect(connection).has_table('post'):
+                connection.exec_driver_sql(
+                    'INSERT INTO post_fts (rowid, title, content) SELECT id, title, content FROM post'
+                )
+
+    def match_expression(self, search_text):
+        # Quote every token so user input can never be parsed as FTS5 syntax
+        return ' OR '.join('"%s"' % token for token in tokenize(search_text))
+
+    def apply(self, query, search_text):
+        expression = self.match_expression(search_text)
+        if not expression:
+            return query.filter(db.false()), db.literal(0)
+        matches = text(
+            'SELECT rowid AS post_id, bm25(post_fts) AS score FROM post_fts WHERE post_fts MATCH :expression'
+        ).bindparams(expression=expression).columns(post_id=Integer, score=Float).subquery('post_fts_matches')
+        query = query.join(matches, matches.c.post_id == Post.id)
+        # bm25() is lower-is-better; flip it so relevance sorts descending
+        return query, -matches.c.score
+
+    def index_post(self, connection, post_id, title, content):
+        connection.exec_driver_sql('DELETE FROM post_fts WHERE rowid = ?', (post_id,))
+        connection.exec_driver_sql(
+            'INSERT INTO post_fts (rowid, title, content) VALUES (?, ?, ?)', (post_id, title, content)
+        )
+
+    def remove_post(self, connection, post_id):
+        connection.exec_driver_sql('DELETE FROM post_fts WHERE rowid = ?', (post_id,))
+
+
+class InvertedIndexBackend(SearchBackend):
+    """Pure-Python TF-IDF inverted index held in process memory.
+
+    Fallback for databases without a native full-text engine. The index is
+    built from the post table on first search and then updated on post
+    writes made by this process, so it is only suitable for a single worker.
+    """
+    name = 'python'
+    transactional = False
+    max_results = 1000
+
+    def __init__(self):
+        self._postings = defaultdict(dict)  # token -> {post_id: term frequency}
+        self._documents = {}  # post_id -> set of tokens
+        self._built = False
+        self._lock = threading.RLock()
+
+    def _build(self):
+        with self._lock:
+            if self._built:
+                return
+            rows = db.session.query(Post.id, Post.title, Post.content).yield_per(1000)
+            for post_id, title, content in rows:
+                self._add(post_id, title, content)
+            self._built = True
+
+    def _add(self, post_id, title, content):
+        self._remove(post_id)
+        frequencies = defaultdict(int)
+        # Title words count double, as a title match is the stronger signal
+        for token in tokenize(title):
+            frequencies[token] += 2
+        for token in tokenize(content):
+            frequencies[token] += 1
+        for token, frequency in frequencies.items():
+            self._postings[token][post_id] = frequency
+        self._documents[post_id] = set(frequencies)
+
+    def _remove(self, post_id):
+        for token in self._documents.pop(post_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(post_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def scores(self, search_text):
+        self._build()
+        with self._lock:
+            total = len(self._documents) or 1
+            scores = defaultdict(float)
+            for token in set(tokenize(search_text)):
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for post_id, frequency in postings.items():
+                    scores[post_id] += (1 + math.log(frequency)) * idf
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return dict(ranked[:self.max_results])
+
+    def apply(self, query, search_text):
+        scores = self.scores(search_text)
+        if not scores:
+            return query.filter(db.false()), db.literal(0)
+        relevance = case(scores, value=Post.id, else_=0)
+        return query.filter(Post.id.in_(list(scores))), relevance
+
+    def index_post(self, connection, post_id, title, content):
+        with self._lock:
+            if self._built:
+                self._add(post_id, title, content)
+
+    def remove_post(self, connection, post_id):
+        with self._lock:
+            self._remove(post_id)
+
+
+BACKENDS = {
+    'mysql': MySQLFulltextBackend,
+    'sqlite': SQLiteFTS5Backend,
+    'python': InvertedIndexBackend,
+}
+
+
+class PostSearch:
+    """Picks the search backend for the configured database (SEARCH_BACKEND)"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        name = app.config.get('SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            name = self._detect(app.config['SQLALCHEMY_DATABASE_URI'])
+        if name not in BACKENDS:
+            raise ValueError(f'Unknown SEARCH_BACKEND: {name}')
+        self.backend = BACKENDS[name]()
+        with app.app_context():
+            self.backend.setup(db.engine)
+        app.extensions['post_search'] = self
+
+    @staticmethod
+    def _detect(database_uri):
+        if database_uri.startswith('mysql'):
+            return 'mysql'
+        if database_uri.startswith('sqlite'):
+            import sqlite3
+            if 'ENABLE_FTS5' in {row[0] for row in sqlite3.connect(':memory:').execute('PRAGMA compile_options')}:
+                return 'sqlite'
+        return 'python'
+
+    def apply(self, query, search_text):
+        """Filter a Post query by search_text; returns (query, relevance expression)"""
+        return self.backend.apply(query, search_text)
+
+
+post_search = PostSearch()
+
+
+# Keep backend-maintained indexes in step with post writes. Transactional
+# backends write in the same flush; in-memory ones are queued on the session
+# and only updated after commit, so a rollback leaves no ghost entries.
+def _apply_change(connection, change):
+    if change[0] == 'index':
+        post_search.backend.index_post(connection, *change[1:])
+    else:
+        post_search.backend.remove_post(connection, *change[1:])
+
+def _sync_index(connection, target, change):
+    if post_search.backend is None:
+        return
+    if post_search.backend.transactional:
+        _apply_change(connection, change)
+    else:
+        object_session(target).info.setdefault('search_changes', []).append(change)
+
+@event.listens_for(Post, 'after_insert')
+def _index_inserted_post(mapper, connection, target):
+    _sync_index(connection, target, ('index', target.id, target.title, target.content))
+
+@event.listens_for(Post, 'after_update')
+def _index_updated_post(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes():
+        _sync_index(connection, target, ('index', target.id, target.title, target.content))
+
+@event.listens_for(Post, 'after_delete')
+def _unindex_deleted_post(mapper, connection, target):
+    _sync_index(connection, target, ('remove', target.id))
+
+@event.listens_for(Session, 'after_commit')
+def _apply_search_changes(session):
+    for change in session.info.pop('search_changes', ()):
+        _apply_change(None, change)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_search_changes(session, previous_transaction):
+    session.info.pop('search_changes', None)
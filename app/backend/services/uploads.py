@@ -0,0 +1,134 @@
+import hashlib
+import io
+import os
+import uuid
+import magic
+from werkzeug.datastructures import MultiDict
+from werkzeug.formparser import parse_form_data
+
+SNIFF_BYTES = 2048
+
+# Accepted media types and the extension stored for each
+MEDIA_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'video/mp4': 'mp4',
+    'video/quicktime': 'mov',
+}
+
+
+class UploadTooLarge(Exception):
+    """Raised while streaming when a file passes the size limit"""
+
+
+class UploadRejected(Exception):
+    """Raised when a file's magic bytes are not an accepted media type"""
+
+
+class StreamingUpload:
+    """Write-only file object the multipart parser streams an upload into.
+
+    Each chunk is counted against max_size, fed to a SHA-256 digest and
+    written straight to a temporary file next to its final location, so at
+    most one chunk of the upload is held in memory. The type is checked with
+    python-magic as soon as the first SNIFF_BYTES have arrived. commit()
+    moves the file to a name derived from its content hash, which stores
+    identical media only once.
+    """
+
+    def __init__(self, directory, max_size, allowed_types=MEDIA_EXTENSIONS):
+        self.directory = directory
+        self.max_size = max_size
+        self.allowed_types = allowed_types
+        self.size = 0
+        self.mimetype = None
+        self._head = b''
+        self._digest = hashlib.sha256()
+        os.makedirs(directory, exist_ok=True)
+        self._path = os.path.join(directory, f".upload-{uuid.uuid4().hex}.tmp")
+        self._file = open(self._path, 'wb')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.discard()
+            raise UploadTooLarge()
+        if self.mimetype is None:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._sniff()
+        self._digest.update(data)
+        self._file.write(data)
+        return len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # The parser rewinds the container once the part is complete;
+        # small files have not been type-checked yet at that point.
+        # Empty parts are dropped by parse_streaming_form, not sniffed
+        if self.mimetype is None and self.size:
+            self._sniff()
+        return 0
+
+    def _sniff(self):
+        mimetype = magic.from_buffer(self._head, mime=True)
+        if mimetype not in self.allowed_types:
+            self.discard()
+            raise UploadRejected(mimetype)
+        self.mimetype = mimetype
+
+    def commit(self, prefix):
+        """Move the upload to its content-addressed name and return that filename"""
+        self._file.close()
+        filename = f"{prefix}_{self._digest.hexdigest()[:32]}.{self.allowed_types[self.mimetype]}"
+        final_path = os.path.join(self.directory, filename)
+        if os.path.exists(final_path):
+            os.remove(self._path)
+        else:
+            os.replace(self._path, final_path)
+        return filename
+
+    def discard(self):
+        """Drop the temporary file; safe to call more than once"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._path):
+            os.remove(self._path)
+
+
+def parse_streaming_form(environ, directory, max_file_size, max_form_memory_size=2 * 1024 * 1024):
+    """Parse a multipart request, streaming every file part into a StreamingUpload.
+
+    Returns (form, files) like request.form / request.files; each file's
+    .stream is the StreamingUpload. File parts with an empty filename or no
+    bytes (an untouched <input type=file>) are left out, as if absent. The
+    caller must commit() or discard() every returned file. Raises UploadTooLarge, UploadRejected or werkzeug's
+    RequestEntityTooLarge (request body over the limits).
+    """
+    uploads = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        if not filename:
+            return io.BytesIO()
+        upload = StreamingUpload(directory, max_file_size)
+        uploads.append(upload)
+        return upload
+
+    try:
+        _, form, files = parse_form_data(
+            environ,
+            stream_factory=stream_factory,
+            max_form_memory_size=max_form_memory_size,
+            max_content_length=max_file_size + max_form_memory_size
+        )
+    except Exception:
+        for upload in uploads:
+            upload.discard()
+        raise
+
+    uploaded = MultiDict()
+    for name, file in files.items(multi=True):
+        if isinstance(file.stream, StreamingUpload) and file.stream.size:
+            uploaded.add(name, file)
+        elif isinstance(file.stream, StreamingUpload):
+            file.stream.discard()
+    return form, uploaded
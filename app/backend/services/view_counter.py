@@ -0,0 +1,88 @@
+import atexit
+import logging
+import threading
+import time
+from sqlalchemy import bindparam, func
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Write-behind buffer for post view counts.
+
+    Read endpoints call record() which only bumps an in-memory counter keyed
+    by post id. Pending increments are written back by flush(), either from a
+    background timer or as soon as the buffer holds max_pending posts, using
+    one executemany UPDATE. Counts in the database are therefore eventually
+    consistent, and GET requests never open a write transaction.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 5.0
+        self.max_pending = 500
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', self.flush_interval)
+        self.max_pending = app.config.get('VIEW_COUNTER_MAX_PENDING', self.max_pending)
+        app.extensions['view_counter'] = self
+
+        if self.flush_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def record(self, post_ids):
+        """Count one view for each of the given post ids"""
+        with self._lock:
+            for post_id in post_ids:
+                self._pending[post_id] = self._pending.get(post_id, 0) + 1
+            should_flush = len(self._pending) >= self.max_pending
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered increments in one batched UPDATE; returns rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self.app is None:
+            return 0
+
+        from models.post import Post
+        table = Post.__table__
+        # Keep updated_at and version untouched: a view is not an edit of the post
+        stmt = table.update().where(table.c.id == bindparam('post_id')).values(
+            views_count=func.coalesce(table.c.views_count, 0) + bindparam('delta'),
+            updated_at=table.c.updated_at,
+            version=table.c.version
+        )
+        # Sorted ids give every flush the same lock order
+        params = [{'post_id': post_id, 'delta': delta} for post_id, delta in sorted(pending.items())]
+
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(stmt, params)
+        except Exception:
+            # Put the increments back so the next flush retries them
+            with self._lock:
+                for post_id, delta in pending.items():
+                    self._pending[post_id] = self._pending.get(post_id, 0) + delta
+            logger.exception('Failed to flush %d post view counts', len(params))
+            return 0
+        return len(params)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+view_counter = ViewCounter()
@@ -152,10 +152,21 @@ const ProfileEdit: React.FC = () => {
         setProgress(30);
         // Upload the image to backend
         const uploadRes = await profileApi.uploadProfileImage(avatarFile);
-        if (uploadRes && uploadRes.imageUrl) {
-          avatarUrl = uploadRes.imageUrl;
-          setAvatarPreview(avatarUrl);
-          setAvatarCacheBuster(Date.now());
+        if (uploadRes && uploadRes.statusUrl) {
+          // Renditions are generated in the background; only use the URL once they exist
+          setProgress(60);
+          const job = await profileApi.waitForProfileImage(uploadRes.statusUrl);
+          if (job.status === 'done' && job.imageUrl) {
+            avatarUrl = job.imageUrl;
+            setAvatarPreview(avatarUrl);
+            setAvatarCacheBuster(Date.now());
+          } else if (job.status === 'failed' || job.message) {
+            setErrors((prev: any) => ({ ...prev, avatar: job.message || 'Image processing failed' }));
+            setUploading(false);
+            setLoading(false);
+            return;
+          }
+          // Still pending: keep the local preview; the server switches the avatar when done
         } else if (uploadRes && uploadRes.message) {
           setErrors((prev: any) => ({ ...prev, avatar: uploadRes.message }));
           setUploading(false);
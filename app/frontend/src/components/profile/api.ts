@@ -45,6 +45,24 @@ export const profileApi = {
     return data;
   },
 
+  // Poll an image job until its renditions are written (status 'done') or it fails
+  waitForProfileImage: async (statusUrl: string, attempts = 30, intervalMs = 1000) => {
+    const token = localStorage.getItem('token');
+    for (let i = 0; i < attempts; i++) {
+      const response = await fetch(`${API_URL}${statusUrl}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+      const data = await response.json();
+      if (!response.ok || data.status !== 'pending') {
+        return data;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+    return { status: 'pending' };
+  },
+
   // Test method that bypasses authentication
   getProfileTest: async () => {
     console.log('[DEBUG] Using test endpoint (no auth required)');